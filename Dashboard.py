@@ -1,19 +1,65 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import calendar
+import os
+
+import figures
+import ranking
+from figures import FigureCache, spec_key
+from shared_cache import SharedCache
+from data_store import print_progress
+from profiling import Profiler
+from ingest import SalesDataset
+from sales_engine import MonthRange, SalesEngine
+import sql_engine
+import warmup
+
+# ---- Profiling (?profile=1 أو SALES_PROFILE=1) ----
+# يقيس وقت كل قسم + فرق الذاكرة، ويعرضها في جدول تحت كل تاب.
+# عدد عمليات pandas مع SALES_PROFILE=1 فقط (يلف دوال pandas للبروسس كله، فما نخليه لأي زائر)
+# SALES_PROFILE_TRACE=path يكتب كل rerun كسطر JSONL
+profiler = Profiler.from_settings(st.query_params,
+                                  session=st.session_state.setdefault("profile_session", os.urandom(4).hex()))
+profiler.start_run("script")
+
+def show_profile(sections):
+    with st.expander(f"⏱ Profile ({sections[0]['ms']:,.1f} ms)"):
+        st.dataframe(Profiler.table(sections), use_container_width=True, hide_index=True)
 
-st.set_page_config(page_title="2024-2025 Sales Dashboard", layout="wide")
+# Load data
+# cache_resource: نسخة وحدة للقراءة فقط مشتركة بين كل الجلسات بدون نسخ
+# الأعمدة المشتقة (Year, Quarter, Month_Label, AOV) تنحسب مرة وحدة داخل load_sales
+# ⚠️ لا تعدّل df في أي مكان تحت
+# show_spinner=False: set_page_config تحت لازم يكون أول أمر Streamlit
+@st.cache_resource(show_spinner=False)
+def load_dataset():
+    # يقرأ من نسخة Feather مخزنة ولا يعيد تحليل الـ CSV إلا إذا تغير
+    # ملفات الأشهر الجديدة في drops/ تنضاف بدون إعادة قراءة التاريخ كله
+    # الملفات الكبيرة تنقرأ على دفعات وتتجمع شهرياً، والتقدم يطلع في الـ console
+    # SALES_SOURCE ممكن يكون مجلد أو glob لملفات المناطق (تنقرأ بالتوازي)
+    source = os.environ.get("SALES_SOURCE", "Sales_2024_2025_upp.csv")
+    return SalesDataset(source, progress=print_progress,
+                        conflict=os.environ.get("SALES_CONFLICT", "last"))
+
+with profiler.section("load"):
+    dataset = load_dataset()
+    # فحص سريع (stat فقط): لو ملف المصدر تغيّر ينعاد تحميله، وملفات drops/ الجديدة تنضاف
+    dataset.refresh()
+    # نسخة ثابتة من الداتا لهذا الـ rerun كله: لو جلسة ثانية سوت refresh بالنص ما تتغير تحتنا
+    snapshot = dataset.snapshot
+
+# السنوات من الداتا نفسها (العنوان والتابات)
+years_label = " + ".join(str(year) for year in snapshot.cube.years)
+st.set_page_config(page_title=f"{years_label} Sales Dashboard", layout="wide")
 
 # ---- Title with Logo ----
 col1, col2 = st.columns([7, 1]) 
 
 with col1:
     st.markdown(
-        """
+        f"""
         <h1 style="color:#000000; font-size:36px; margin-top:15px; margin-bottom:5px;">
-            📊 2024-2025 Sales Dashboard
+            📊 {years_label} Sales Dashboard
         </h1>
         """,
         unsafe_allow_html=True
@@ -25,16 +71,146 @@ with col2:
         width=100
     )
 
-# Load data
-@st.cache_data
-def load_data():
-    df = pd.read_csv("Sales_2024_2025_upp.csv")
-    df["Month"] = pd.to_datetime(df["Month"], errors="coerce")
-    return df
-df = load_data()
+# كاش مشترك بين كل الجلسات (LRU بحد للذاكرة + TTL) للنتائج والتشارتات
+# المفتاح فيه data_version، فأي تحديث للداتا ما يرجع نتائج قديمة
+CACHE_MB = int(os.environ.get("SALES_CACHE_MB", "64"))
+CACHE_TTL = int(os.environ.get("SALES_CACHE_TTL", "3600"))
+
+@st.cache_resource
+def load_result_cache():
+    return SharedCache(max_bytes=CACHE_MB * 2**20, ttl=CACHE_TTL)
+
+@st.cache_resource
+def load_figure_cache():
+    return FigureCache(max_bytes=CACHE_MB * 2**20, ttl=CACHE_TTL)
+
+result_cache = load_result_cache()
+figure_cache = load_figure_cache()
+
+# كل الحسابات من engine (مكعب الإجماليات + فهرس الفروع)، الواجهة هنا للعرض فقط
+# SALES_BACKEND=duckdb: الإجماليات تنحسب SQL في DuckDB فوق ملف الـ store مباشرة
+# (لو duckdb مو مثبت نرجع لـ pandas). الداتا نفسها تبقى محملة (التشارتات والتوقع منها)، فما يوفر ذاكرة
+df = snapshot.df
+version = snapshot.version
+# نسخة جديدة (ملف الـ CSV تغيّر أو drops جديدة) تمسح نتائج وتشارتات النسخة القديمة
+result_cache.set_version(version)
+figure_cache.set_version(version)
+BACKEND = os.environ.get("SALES_BACKEND", "pandas")
+
+@st.cache_resource(max_entries=1)
+def load_sql_engine(version):
+    # نسخة وحدة لكل data_version (اتصال DuckDB واحد مشترك)
+    return sql_engine.DuckDBEngine.from_dataset(dataset, cache=result_cache)
+
+if BACKEND == "duckdb" and sql_engine.available():
+    engine = load_sql_engine(version)
+else:
+    if BACKEND == "duckdb":
+        st.warning("⚠️ SALES_BACKEND=duckdb but duckdb is not installed; using the pandas engine.")
+    engine = SalesEngine.from_dataset(snapshot, cache=result_cache)
+
+# ---- وضع التشارتات الخفيف ووضع الـ debug ----
+# compact: كل تشارت يرسل المقياس المختار فقط (بدل الثلاثة مع updatemenus)،
+# السلاسل الطويلة تنقص بـ LTTB وتنرسل float32 (base64 من plotly)؛ إجماليات الأعمدة تبقى float64
+# لأن float32 ما يحفظ المبالغ فوق ~16.7M وأرقامها ظاهرة على الأعمدة
+# debug: حجم الـ payload تحت كل تشارت + إحصائيات الكاش
+COMPACT_DEFAULT = os.environ.get("SALES_COMPACT_CHARTS", "0") == "1"
+COMPACT = st.query_params.get("compact", "1" if COMPACT_DEFAULT else "0") == "1"
+DEBUG = st.query_params.get("debug", os.environ.get("SALES_DEBUG", "0")) == "1"
+MAX_POINTS = 400
+# خط التوقع (متقطع) على تشارتات الفروع الشهرية: ?forecast=0 أو SALES_FORECAST=0 يخفيه
+FORECAST_DEFAULT = os.environ.get("SALES_FORECAST", "1") == "1"
+FORECAST = st.query_params.get("forecast", "1" if FORECAST_DEFAULT else "0") == "1"
+PAGE_SIZE = 50   # صفوف جدول المساهمة في الصفحة
+
+# تنسيق الأعمدة الرقمية في المتصفح: القيم تبقى أرقام فالترتيب من رأس العمود رقمي مو أبجدي
+# step يحدد عدد الخانات العشرية مع فاصل الآلاف، percent للنسب الكسرية (0.0325 → 3.25%)
+NUMBER_FORMATS = {
+    "Net_Sales": {"step": 1},
+    "Discount_Amount": {"step": 1},
+    "Orders": {"step": 1},
+    "AOV": {"step": 0.01},
+    "Discount_Rate": {"format": "percent"},
+    "YoY %": {"format": "%.1f%%"},
+    "Contribution %": {"format": "%.2f%%"},
+}
+
+def number_columns(table):
+    return {col: st.column_config.NumberColumn(**NUMBER_FORMATS[col])
+            for col in table.columns if col in NUMBER_FORMATS}
+
+def metric_picker(options, key):
+    """المقياس المختار في الوضع الخفيف، أو None (كل المقاييس مع الأزرار)."""
+    if not COMPACT:
+        return None
+    return st.radio("Metric", options, format_func=figures.series_label, horizontal=True, key=key)
+
+def show_chart(fig, name="chart"):
+    with profiler.section(f"render: {name}"):
+        st.plotly_chart(fig, use_container_width=True)
+    if DEBUG:
+        st.caption(f"🔧 payload {figures.payload_size(fig) / 1024:,.1f} KB · {len(fig.data)} traces")
+
+# ---- تشارتات الفروع (نفس مفتاح الكاش للتابات وللـ warm-up) ----
+def default_metric(rows, compact):
+    return figures.metric_columns(rows)[0] if compact else None
+
+# التوقعات لكل الفروع تنحسب مرة وحدة لكل data_version (engine.forecast)
+def overview_figure(branch, level="month", metric=None, forecast=False):
+    rows = engine.branch_series(branch, level=level)
+    forecast = forecast and level == "month"
+    return figure_cache.get(
+        spec_key("metric_lines", branch, None, version, level=level, metric=metric, forecast=forecast),
+        profiler.timed("figure: metric_lines", lambda: figures.metric_lines(
+            rows, level=level, metric=metric, max_points=MAX_POINTS,
+            forecast=engine.branch_forecast(branch) if forecast else None)),
+    )
+
+def year_figure(branch, year, metric=None, forecast=False):
+    rows = engine.branch_series(branch, f"{year}-01-01", f"{year}-12-31")
+    return figure_cache.get(
+        spec_key("metric_lines", branch, year, version, metric=metric, forecast=forecast),
+        profiler.timed("figure: metric_lines", lambda: figures.metric_lines(
+            rows, f" ({year})", orders_color="blue", metric=metric, max_points=MAX_POINTS,
+            forecast=engine.branch_forecast(branch, f"{year}-01-01", f"{year}-12-31") if forecast else None)),
+    )
+
+# ---- Warm-up بالخلفية ----
+# أول ما تظهر data_version جديدة (تشغيل السيرفر أو تحديث drops) نحسب بـ thread pool
+# ونعبّي الكاش المشترك قبل ما يوصلها أحد: أول شي عروض كل الفروع (KPIs، المساهمة،
+# النمو لكل زوج سنوات، تشارتات All Branches)، بعدين الفرع الافتراضي وأكبر الفروع
+# مبيعاً فقط (SALES_WARMUP_BRANCHES). يوقف لو عبّى نص أي كاش أو طرد منه شي،
+# عشان ما يطرد اللي حسبه أول. SALES_WARMUP_WORKERS=0 يوقفه
+WARMUP_WORKERS = int(os.environ.get("SALES_WARMUP_WORKERS", str(warmup.DEFAULT_WORKERS)))
+WARMUP_BRANCHES = int(os.environ.get("SALES_WARMUP_BRANCHES", str(warmup.DEFAULT_BRANCHES)))
+
+def warm_figures(branch):
+    metric = default_metric(engine.branch_series(branch), COMPACT_DEFAULT)
+    jobs = [] if branch == "All Branches" else [
+        (f"overview figure {branch}", lambda: overview_figure(branch, metric=metric, forecast=FORECAST_DEFAULT))]
+    jobs += [(f"year figure {year} {branch}",
+              lambda year=year: year_figure(branch, year, metric, forecast=FORECAST_DEFAULT))
+             for year in engine.years]
+    return jobs
+
+def warm_jobs():
+    jobs = warmup.engine_jobs(engine) + warm_figures("All Branches")
+    for branch in warmup.top_branches(engine, WARMUP_BRANCHES, first=engine.branches[0] if engine.branches else None):
+        jobs += warmup.branch_jobs(engine, branch) + warm_figures(branch)
+    return jobs
+
+@st.cache_resource
+def load_warmer():
+    return warmup.Warmer(WARMUP_WORKERS, caches=[result_cache, figure_cache])
+
+warm = load_warmer().ensure(version, warm_jobs) if WARMUP_WORKERS > 0 else None
+
+for name, (_, error) in dataset.rejected.items():
+    st.warning(f"⚠️ Skipped drop file {name}: {error}")
 
 # Tabs
-tabs = st.tabs(["📊 Overview", "📅 2024", "📅 2025", "⚖ Comparison"])
+years = engine.years
+tabs = st.tabs(["📊 Overview"] + [f"📅 {year}" for year in years] + ["⚖ Comparison"])
 
 # ---- CSS for cards ----
 st.markdown("""
@@ -111,18 +287,26 @@ st.markdown("""
          </style>
     """, unsafe_allow_html=True)
 
+# ---------------- Tabs ----------------
+# كل تاب fragment: تغيير فلتر داخل التاب يعيد تشغيل هذا التاب فقط
+# بدل ما يعيد حساب كل التابات. الداتا المشتركة من load_dataset (كاش وحدة).
+
 # ---------------- Tab 1 ----------------
-with tabs[0]:
+@st.experimental_fragment
+@profiler.profiled("Overview", show_profile)
+def overview_tab():
 
     # ---- Start Container ----
     st.markdown('<div class="main-container">', unsafe_allow_html=True)
     
     # KPIs
-    total_net = df["Net_Sales"].sum()
-    total_discount = df["Discount_Amount"].sum()
-    total_orders = df["Orders"].sum()
+    with profiler.section("kpis"):
+        totals = engine.kpis()
+    total_net = totals.net_sales
+    total_discount = totals.discount
+    total_orders = totals.orders
     
-    st.subheader("📊 Total Numbers for Branchs Performance in 2024 + 2025")
+    st.subheader(f"📊 Total Numbers for Branchs Performance in {years_label}")
     st.write("")
 
     # ---- First row: 4 KPIs ----
@@ -166,145 +350,101 @@ with tabs[0]:
     st.markdown("<div style='margin-bottom:15px;'></div>", unsafe_allow_html=True)
     st.markdown("<hr style='border:2px solid #007BFF'>", unsafe_allow_html=True)
 
-    st.subheader("📊 Performance of the Selected Branch in 2024 + 2025")
+    st.subheader(f"📊 Performance of the Selected Branch in {years_label}")
 
     # ---- Branch filter ----
-    branches = sorted(df["Branch"].unique())
+    branches = engine.branches
     selected_branch = st.selectbox("Select Branch", branches)
-
-    df["Month"] = pd.to_datetime(df["Month"], errors="coerce")
-    # إنشاء عمود نصي للعرض (سنة-شهر فقط)
-    df["Month_Label"] = df["Month"].dt.strftime("%b %Y")
-    
-    # ---- Filter data ----
-    branch_df = df[df["Branch"] == selected_branch]
-
-    # ---- Charts ----
-    fig = go.Figure()
-
-    # Add Net Sales
-    fig.add_trace(go.Scatter(
-        x=branch_df["Month_Label"],
-        y=branch_df["Net_Sales"],
-        mode="lines+markers",
-        name="Net Sales",
-        line=dict(color="#2ecc71"),   # ✅ اللون أخضر
-        visible=True
-    ))
-
-    # Add Discounts
-    fig.add_trace(go.Scatter(
-        x=branch_df["Month_Label"],
-        y=branch_df["Discount_Amount"],
-        mode="lines+markers",
-        name="Discounts",
-        line=dict(color="red"),     # ✅ اللون أحمر
-        visible=False
-    ))
-
-    # Add Orders
-    fig.add_trace(go.Scatter(
-        x=branch_df["Month_Label"],
-        y=branch_df["Orders"],
-        mode="lines+markers",
-        name="Orders",
-        visible=False
-    ))
-
-    # Buttons menu
-    fig.update_layout(
-        updatemenus=[
-            dict(
-                type="buttons",
-                direction="left",
-                buttons=list([
-                    dict(label="Net Sales",
-                        method="update",
-                        args=[{"visible": [True, False, False]},
-                            {"title": {"text": "Net Sales by Month"}}]),
-                    dict(label="Discounts",
-                        method="update",
-                        args=[{"visible": [False, True, False]},
-                            {"title":{"text": "Discounts by Month"}}]),
-                    dict(label="Orders",
-                        method="update",
-                        args=[{"visible": [False, False, True]},
-                            {"title":{"text": "Orders by Month"}}]),
-                ]),
-                x=0.5,
-                y=1.15,
-                xanchor="center",
-                yanchor="top"
-            )
-        ]
-    )
-
-    # Layout style
-    fig.update_layout(
-        title="Net Sales by Month",
-        showlegend=False
-    )
-
-    fig.update_yaxes(
-        tickformat="d"   # ✅ يعرض أعداد صحيحة فقط بدون كسور
-    )
-
-    st.plotly_chart(fig, use_container_width=True)
+    level = st.radio("Granularity", ["month", "quarter", "year"], format_func=str.title,
+                     horizontal=True, key="overview_level")
+
+    # ---- Charts (slice الفرع من الـ rollup، والتشارت من الكاش) ----
+    with profiler.section("branch series"):
+        rows = engine.branch_series(selected_branch, level=level)
+    metric = metric_picker(figures.metric_columns(rows), "overview_metric")
+    fig = overview_figure(selected_branch, level, metric, FORECAST)
+    show_chart(fig, "metric_lines")
     st.markdown("<hr style='border:2px solid #007BFF'>", unsafe_allow_html=True)
     
     # ---- Branch Contribution ----
-    st.markdown("### 🏬 Percentage of Contribution of Each Branch to Total Sales 2024 + 2025")
-
-    # ---- حساب مساهمة كل فرع ----
-    totals_by_branch = df.groupby("Branch").agg({
-        "Net_Sales": "sum"
-    }).reset_index()
-
-    # إجمالي المبيعات لكل الفروع
-    total_sales = totals_by_branch["Net_Sales"].sum()
-
-    # حساب نسبة المساهمة
-    totals_by_branch["Contribution %"] = (totals_by_branch["Net_Sales"] / total_sales * 100).round(2)
-
-    # ترتيب من الأعلى إلى الأقل
-    totals_by_branch = totals_by_branch.sort_values("Net_Sales", ascending=False).reset_index(drop=True)
+    st.markdown(f"### 🏬 Percentage of Contribution of Each Branch to Total Sales {years_label}")
+
+    # ---- مساهمة كل فرع (مرتبة من الأعلى إلى الأقل) ----
+    with profiler.section("contribution"):
+        totals_by_branch = engine.contribution()
+
+        # عرض في ستريم ليت كجدول، صفحة صفحة (بدل Styler، التنسيق في المتصفح)
+        n_pages = ranking.page_count(len(totals_by_branch), PAGE_SIZE)
+        page_no = 1
+        if n_pages > 1:
+            page_no = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1,
+                                      key="contribution_page")
+        contribution_page = ranking.page(totals_by_branch, page_no, PAGE_SIZE)
+        st.dataframe(
+        contribution_page,
+        column_config=number_columns(contribution_page),
+        use_container_width=True
+        )
+    st.markdown("<hr style='border:2px solid #007BFF'>", unsafe_allow_html=True)
 
-    # عرض في ستريم ليت كجدول
-    st.dataframe(
-    totals_by_branch.style.format({
-        "Net_Sales": "{:,.0f}",
-        "Contribution %": "{:.2f}%"
-    }),
-    use_container_width=True
-    )
+    # ---- Leaderboard: أعلى/أقل N فرع حسب أي مقياس (argpartition بدل ترتيب كامل) ----
+    st.markdown("### 🏆 Branch Leaderboard")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        rank_metric = st.selectbox("Rank by", list(ranking.RANK_METRICS),
+                                   format_func=ranking.RANK_METRICS.get, key="rank_metric")
+    with col2:
+        rank_side = st.radio("Show", ["Top", "Bottom"], horizontal=True, key="rank_side")
+    with col3:
+        rank_n = st.number_input("Branches", min_value=1, max_value=max(len(engine.branches), 1),
+                                 value=min(10, max(len(engine.branches), 1)), key="rank_n")
+
+    with profiler.section("leaderboard"):
+        board = engine.leaderboard(rank_metric, rank_n, rank_side == "Bottom")
+        board = board[["Rank", "Branch", "Net_Sales", "Orders", "AOV", "Discount_Rate", "YoY %"]]
+        st.dataframe(board, column_config=number_columns(board), use_container_width=True, hide_index=True)
+        if rank_metric == "YoY %":
+            st.caption("Branches without sales in the earlier year have no growth and are not ranked.")
+
+    # ---- توقع الربع القادم لكل الفروع (من نفس الـ fit المجمّع) ----
+    if FORECAST:
+        st.markdown("<hr style='border:2px solid #007BFF'>", unsafe_allow_html=True)
+        with profiler.section("forecast"):
+            quarter, projected = engine.next_quarter_forecast()
+            st.markdown(f"### 🔮 Projected Branch Performance for {quarter}")
+            n_pages = ranking.page_count(len(projected), PAGE_SIZE)
+            page_no = 1
+            if n_pages > 1:
+                page_no = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1,
+                                          key="forecast_page")
+            projected_page = ranking.page(projected, page_no, PAGE_SIZE)
+            st.dataframe(projected_page, column_config=number_columns(projected_page), use_container_width=True)
+            st.caption("Linear trend plus month-of-year seasonality, fitted per branch on its monthly history.")
 
     # ---- End Container ----
     st.markdown('</div>', unsafe_allow_html=True)
 
-# ---------------- Tab 2 ----------------
-with tabs[1]:
+# ---------------- Year tabs ----------------
+# تاب لكل سنة موجودة في الداتا، نفس الدالة لكل السنوات (إجماليات السنة من engine.by_year)
+@st.experimental_fragment
+@profiler.profiled("{}", show_profile)
+def year_tab(year):
 
     # ✅ Start main container
     st.markdown('<div class="main-container">', unsafe_allow_html=True)
     
-    st.subheader("📊 KPIs for Branchs Performance in 2024")
+    st.subheader(f"📊 KPIs for Branchs Performance in {year}")
 
-    # ---- فلترة بيانات 2024 ----
-    df["Year"] = df["Month"].dt.year
-    df_2024 = df[df["Year"] == 2024]
-    
     # ---- Branch Filter ----
-    branches = ["All Branches"] + sorted(df["Branch"].unique())
-    selected_branch_2024 = st.selectbox("🏬 Select Branch (2024)", branches, index=0)
-
-    # ---- فلترة بناءً على الاختيار ----
-    if selected_branch_2024 != "All Branches":
-        df_2024 = df_2024[df_2024["Branch"] == selected_branch_2024]
+    branches = ["All Branches"] + engine.branches
+    selected_branch = st.selectbox(f"🏬 Select Branch ({year})", branches, index=0, key=f"year_branch_{year}")
 
-    # ---- KPIs (2024 فقط) ----
-    total_net_2024 = df_2024["Net_Sales"].sum()
-    total_discount_2024 = df_2024["Discount_Amount"].sum()
-    total_orders_2024 = df_2024["Orders"].sum()
+    # ---- KPIs (السنة المختارة فقط) ----
+    with profiler.section("kpis"):
+        totals = engine.year_kpis(year, None if selected_branch == "All Branches" else selected_branch)
+    total_net = totals.net_sales
+    total_discount = totals.discount
+    total_orders = totals.orders
 
     # ---- First row: 3 KPIs ----
     col1, col2, col3 = st.columns(3)
@@ -314,7 +454,7 @@ with tabs[1]:
             <div class="metric-card">
                 <h4>Total Net Sales</h4>
                 <h2 style="display:flex;align-items:center;justify-content:center;gap:6px;">
-                {total_net_2024:,.0f}
+                {total_net:,.0f}
                 <img src="https://upload.wikimedia.org/wikipedia/commons/thumb/9/98/Saudi_Riyal_Symbol.svg/500px-Saudi_Riyal_Symbol.svg.png" 
                      alt="SAR" width="25" height="25">
             </h2>
@@ -327,7 +467,7 @@ with tabs[1]:
             <div class="metric-card">
                 <h4>Total Discounts</h4>
                 <h2 style="display:flex;align-items:center;justify-content:center;gap:6px;">
-                {total_discount_2024:,.0f}
+                {total_discount:,.0f}
                 <img src="https://upload.wikimedia.org/wikipedia/commons/thumb/9/98/Saudi_Riyal_Symbol.svg/500px-Saudi_Riyal_Symbol.svg.png" 
                      alt="SAR" width="25" height="25">
             </h2>
@@ -339,253 +479,46 @@ with tabs[1]:
             f"""
             <div class="metric-card">
                 <h4>Total Orders</h4>
-                <h2>{total_orders_2024:,}</h2>
+                <h2>{total_orders:,}</h2>
             </div>
             """, unsafe_allow_html=True
         )   
 
-    # Filtered data
-    branch_df_2024 = df_2024[df_2024["Branch"] == selected_branch_2024]
-
-    # ---- Chart (2024 فقط) ----
-    fig2024 = go.Figure()
-
-    # Add Net Sales
-    fig2024.add_trace(go.Scatter(
-        x=branch_df_2024["Month_Label"],
-        y=branch_df_2024["Net_Sales"],
-        mode="lines+markers",
-        name="Net Sales",
-        line=dict(color="#2ecc71"),   # أخضر فاتح
-        visible=True
-    ))
-
-    # Add Discounts
-    fig2024.add_trace(go.Scatter(
-        x=branch_df_2024["Month_Label"],
-        y=branch_df_2024["Discount_Amount"],
-        mode="lines+markers",
-        name="Discounts",
-        line=dict(color="red"),       # أحمر
-        visible=False
-    ))
-
-    # Add Orders
-    fig2024.add_trace(go.Scatter(
-        x=branch_df_2024["Month_Label"],
-        y=branch_df_2024["Orders"],
-        mode="lines+markers",
-        name="Orders",
-        line=dict(color="blue"),      # أزرق
-        visible=False
-    ))
-
-    # Buttons menu
-    fig2024.update_layout(
-        updatemenus=[
-            dict(
-                type="buttons",
-                direction="left",
-                buttons=list([
-                    dict(label="Net Sales",
-                        method="update",
-                        args=[{"visible": [True, False, False]},
-                            {"title": {"text": "Net Sales by Month (2024)"}}]),
-                    dict(label="Discounts",
-                        method="update",
-                        args=[{"visible": [False, True, False]},
-                            {"title":{"text": "Discounts by Month (2024)"}}]),
-                    dict(label="Orders",
-                        method="update",
-                        args=[{"visible": [False, False, True]},
-                            {"title":{"text": "Orders by Month (2024)"}}]),
-                ]),
-                x=0.5,
-                y=1.15,
-                xanchor="center",
-                yanchor="top"
-            )
-        ]
-    )
-
-    # Layout style
-    fig2024.update_layout(
-        title={"text": "Net Sales by Month (2024)"},
-        showlegend=False
-    )
-
-    fig2024.update_yaxes(
-        tickformat="d"   # ✅ أعداد صحيحة فقط
-    )
-
-    st.plotly_chart(fig2024, use_container_width=True)
+    # ---- Chart (السنة فقط) - slice من الفهرس، فاضي لو All Branches ----
+    with profiler.section("branch series"):
+        rows = engine.branch_series(selected_branch, f"{year}-01-01", f"{year}-12-31")
+    metric = metric_picker(figures.metric_columns(rows), f"year_metric_{year}")
+    fig = year_figure(selected_branch, year, metric, FORECAST)
+    show_chart(fig, "metric_lines")
 
     # ✅ End main container
     st.markdown('</div>', unsafe_allow_html=True)
 
-    # ---------------- Tab 3 ----------------
-with tabs[2]:
+# ---------------- Tab 4 ----------------
+PERIOD_NAMES = ["First", "Second", "Third", "Fourth", "Fifth", "Sixth"]
+
+@st.experimental_fragment
+@profiler.profiled("Comparison", show_profile)
+def comparison_tab():
 
     # ✅ Start main container
     st.markdown('<div class="main-container">', unsafe_allow_html=True)
 
-    st.subheader("📊 KPIs for Branchs Performance in 2025")
-
-    # ---- فلترة بيانات 2025 ----
-    df["Year"] = df["Month"].dt.year
-    df_2025 = df[df["Year"] == 2025]
-
-    # ---- Branch Filter ----
-    branches = ["All Branches"] + sorted(df["Branch"].unique())
-    selected_branch = st.selectbox("🏬 Select Branch", branches, index=0)
-
-    # ---- فلترة بناءً على الاختيار ----
-    if selected_branch != "All Branches":
-        df_2025 = df_2025[df_2025["Branch"] == selected_branch]
-
-    # ---- KPIs (2025 فقط) ----
-    total_net_2025 = df_2025["Net_Sales"].sum()
-    total_discount_2025 = df_2025["Discount_Amount"].sum()
-    total_orders_2025 = df_2025["Orders"].sum()
-
-    # ---- First row: 3 KPIs ----
-    col1, col2, col3 = st.columns(3)
+    # ---- اختيار السنتين (افتراضياً آخر سنتين في الداتا) ----
+    col1, col2 = st.columns(2)
     with col1:
-        st.markdown(
-            f"""
-            <div class="metric-card">
-                <h4>Total Net Sales</h4>
-                <h2 style="display:flex;align-items:center;justify-content:center;gap:6px;">
-                {total_net_2025:,.0f}
-                <img src="https://upload.wikimedia.org/wikipedia/commons/thumb/9/98/Saudi_Riyal_Symbol.svg/500px-Saudi_Riyal_Symbol.svg.png" 
-                     alt="SAR" width="25" height="25">
-            </h2>
-        </div>
-        """, unsafe_allow_html=True
-        )
+        year_from = st.selectbox("From Year", years, index=max(len(years) - 2, 0), key="yoy_from")
     with col2:
-        st.markdown(
-            f"""
-            <div class="metric-card">
-                <h4>Total Discounts</h4>
-                <h2 style="display:flex;align-items:center;justify-content:center;gap:6px;">
-                {total_discount_2025:,.0f}
-                <img src="https://upload.wikimedia.org/wikipedia/commons/thumb/9/98/Saudi_Riyal_Symbol.svg/500px-Saudi_Riyal_Symbol.svg.png" 
-                     alt="SAR" width="25" height="25">
-            </h2>
-        </div>
-        """, unsafe_allow_html=True
-        )
-    with col3:
-        st.markdown(
-            f"""
-            <div class="metric-card">
-                <h4>Total Orders</h4>
-                <h2>{total_orders_2025:,}</h2>
-            </div>
-            """, unsafe_allow_html=True
-        )
-
-    # Filtered data
-    branch_df_2025 = df_2025[df_2025["Branch"] == selected_branch]
-
-    # ---- Chart (2025 فقط) ----
-    fig2025 = go.Figure()
-
-    # Add Net Sales
-    fig2025.add_trace(go.Scatter(
-        x=branch_df_2025["Month_Label"],
-        y=branch_df_2025["Net_Sales"],
-        mode="lines+markers",
-        name="Net Sales",
-        line=dict(color="#2ecc71"),   # أخضر فاتح
-        visible=True
-    ))
-
-    # Add Discounts
-    fig2025.add_trace(go.Scatter(
-        x=branch_df_2025["Month_Label"],
-        y=branch_df_2025["Discount_Amount"],
-        mode="lines+markers",
-        name="Discounts",
-        line=dict(color="red"),       # أحمر
-        visible=False
-    ))
-
-    # Add Orders
-    fig2025.add_trace(go.Scatter(
-        x=branch_df_2025["Month_Label"],
-        y=branch_df_2025["Orders"],
-        mode="lines+markers",
-        name="Orders",
-        line=dict(color="blue"),      # أزرق
-        visible=False
-    ))
-
-    # Buttons menu
-    fig2025.update_layout(
-        updatemenus=[
-            dict(
-                type="buttons",
-                direction="left",
-                buttons=list([
-                    dict(label="Net Sales",
-                        method="update",
-                        args=[{"visible": [True, False, False]},
-                            {"title": {"text": "Net Sales by Month (2025)"}}]),
-                    dict(label="Discounts",
-                        method="update",
-                        args=[{"visible": [False, True, False]},
-                            {"title":{"text": "Discounts by Month (2025)"}}]),
-                    dict(label="Orders",
-                        method="update",
-                        args=[{"visible": [False, False, True]},
-                            {"title":{"text": "Orders by Month (2025)"}}]),
-                ]),
-                x=0.5,
-                y=1.15,
-                xanchor="center",
-                yanchor="top"
-            )
-        ]
-    )
-
-    # Layout style
-    fig2025.update_layout(
-        title={"text": "Net Sales by Month (2025)"},
-        showlegend=False
-    )
-
-    fig2025.update_yaxes(
-        tickformat="d"   # ✅ أعداد صحيحة فقط
-    )
-
-    st.plotly_chart(fig2025, use_container_width=True)
-
-    # ✅ End main container
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    # ---------------- Tab 4 ----------------
-with tabs[3]:
-
-    # ✅ Start main container
-    st.markdown('<div class="main-container">', unsafe_allow_html=True)
-
-    # ---- فلترة البيانات ----
-    df_2024 = df[df["Year"] == 2024]
-    df_2025 = df[df["Year"] == 2025]
+        year_to = st.selectbox("To Year", years, index=len(years) - 1, key="yoy_to")
 
-    # ---- إجماليات ----
-    net_2024, net_2025 = df_2024["Net_Sales"].sum(), df_2025["Net_Sales"].sum()
-    disc_2024, disc_2025 = df_2024["Discount_Amount"].sum(), df_2025["Discount_Amount"].sum()
-    orders_2024, orders_2025 = df_2024["Orders"].sum(), df_2025["Orders"].sum()
+    # ---- النسب (صفر لو إجمالي سنة البداية صفر) ----
+    with profiler.section("yoy: all branches"):
+        growth = engine.yoy_growth(None, year_from, year_to).growth
+    net_growth = growth.net_sales or 0
+    disc_growth = growth.discount or 0
+    orders_growth = growth.orders or 0
 
-    # ---- النسب ----
-    net_growth = ((net_2025 - net_2024) / net_2024) * 100 if net_2024 != 0 else 0
-    disc_growth = ((disc_2025 - disc_2024) / disc_2024) * 100 if disc_2024 != 0 else 0
-    orders_growth = ((orders_2025 - orders_2024) / orders_2024) * 100 if orders_2024 != 0 else 0
-
-    st.subheader("📊 Total of Year-over-Year Growth Between 2024 → 2025")
+    st.subheader(f"📊 Total of Year-over-Year Growth Between {year_from} → {year_to}")
     st.write("")
 
     # ---- First row: 3 KPIs ----
@@ -628,11 +561,11 @@ with tabs[3]:
     st.markdown("<hr style='border:2px solid #007BFF'>", unsafe_allow_html=True)
     
     # ---- عنوان ----
-    st.subheader("📊 Year-over-Year Growth for Selected Branches Between 2024 → 2025")
+    st.subheader(f"📊 Year-over-Year Growth for Selected Branches Between {year_from} → {year_to}")
     st.write("")
 
     # ---- Branch filter ----
-    branches = sorted(df["Branch"].unique())
+    branches = engine.branches
     selected_branches = st.multiselect(
         "🏬 Select Branches",
         branches,
@@ -640,30 +573,17 @@ with tabs[3]:
     )
 
     if selected_branches:
-        # ---- فلترة الداتا على الفروع المختارة ----
-        df_selected = df[df["Branch"].isin(selected_branches)]
-
-        # ---- تقسيم حسب السنوات ----
-        df_2024 = df_selected[df_selected["Year"] == 2024]
-        df_2025 = df_selected[df_selected["Year"] == 2025]
-
-        # ---- إجماليات ----
-        net_2024, net_2025 = df_2024["Net_Sales"].sum(), df_2025["Net_Sales"].sum()
-        disc_2024, disc_2025 = df_2024["Discount_Amount"].sum(), df_2025["Discount_Amount"].sum()
-        orders_2024, orders_2025 = df_2024["Orders"].sum(), df_2025["Orders"].sum()
-
-        # ---- دالة تحسب النمو ----
-        def safe_growth(v2024, v2025):
-            if v2024 == 0 and v2025 == 0:
-                return "N/A"
-            elif v2024 == 0 and v2025 != 0:
-                return "N/A"
-            else:
-                return round(((v2025 - v2024) / v2024) * 100, 1)
+        # ---- النمو للفروع المختارة (None لو إجمالي سنة البداية صفر) ----
+        with profiler.section("yoy: selected branches"):
+            growth = engine.yoy_growth(selected_branches, year_from, year_to).growth
 
-        net_growth = safe_growth(net_2024, net_2025)
-        disc_growth = safe_growth(disc_2024, disc_2025)
-        orders_growth = safe_growth(orders_2024, orders_2025)
+        # ---- دالة تجهز النمو للعرض ----
+        def safe_growth(value):
+            return "N/A" if value is None else round(value, 1)
+
+        net_growth = safe_growth(growth.net_sales)
+        disc_growth = safe_growth(growth.discount)
+        orders_growth = safe_growth(growth.orders)
 
         # ---- دالة تحدد اللون ----
         def growth_color(val):
@@ -716,58 +636,29 @@ with tabs[3]:
     st.markdown("<div style='margin-bottom:15px;'></div>", unsafe_allow_html=True)
     st.markdown("<hr style='border:2px solid #007BFF'>", unsafe_allow_html=True)
 
-        
-    # ---- تجهيز العمود Month ----
-    df["Month"] = pd.to_datetime(df["Month"], errors="coerce")   # ✅ التحويل مرة وحدة في البداية
-    df["Month_Label"] = df["Month"].dt.strftime("%b %Y")
 
-    st.subheader(f"📊 Average Order Value per Month - {selected_branch}")
+    st.subheader(f"📊 Average Order Value per Month - {st.session_state.get('aov_branch', engine.branches[0])}")
 
     # ---- Branch filter ----
-    branches = sorted(df["Branch"].unique())
-    selected_branch = st.selectbox("🏬 Select Branch", branches)
+    branches = ["All Branches"] + engine.branches
+    selected_branch = st.selectbox("🏬 Select Branch", branches, index=1, key="aov_branch")
 
-    # ---- فلترة الداتا على الفرع المختار ----
-    df_branch = df[df["Branch"] == selected_branch].copy()
-
-    # ---- حساب متوسط قيمة الطلب ----
-    df_branch["Avg_Order_Value"] = df_branch.apply(
-        lambda row: row["Net_Sales"] / row["Orders"] if row["Orders"] > 0 else 0,
-        axis=1
-    )
-
-    # ---- تجهيز الجدول ----
-    avg_table = df_branch.sort_values("Month")[["Month_Label", "Avg_Order_Value"]]
-
-    # ---- عرض لاين تشارت ----
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=avg_table["Month_Label"],
-        y=avg_table["Avg_Order_Value"],
-        mode="lines+markers",
-        line=dict(color="#007BFF", width=3),
-        marker=dict(size=8),
-        name="Avg Order Value"
-    ))
-
-    fig.update_layout(
-        title=f"📈 Average Order Value per Month - {selected_branch}",
-        xaxis_title="Month",
-        yaxis_title="Average Order Value (SAR)",
-        hovermode="x unified",
-        plot_bgcolor="white"
-    )
+    # ---- متوسط قيمة الطلب (vectorized) من الإجماليات الشهرية في المكعب ----
+    def build_aov():
+        monthly = engine.monthly_series(None if selected_branch == "All Branches" else selected_branch)
+        return figures.aov_line(monthly, selected_branch, MAX_POINTS if COMPACT else None, COMPACT)
 
-    st.plotly_chart(fig, use_container_width=True)
+    fig = figure_cache.get(spec_key("aov_line", selected_branch, None, version, compact=COMPACT),
+                           profiler.timed("figure: aov_line", build_aov))
+    show_chart(fig, "aov_line")
 
     # ---- خط فاصل ----
     st.markdown("<hr style='border:2px solid #007BFF'>", unsafe_allow_html=True)
 
-    st.subheader("📊 Comparing the Performance of a Specific Branches Between Two Different Periods")
+    st.subheader("📊 Comparing the Performance of a Specific Branches Between Different Periods")
 
     # ---- Branch filter (multiple selection) ----
-    branches_comp = sorted(df["Branch"].unique())
+    branches_comp = engine.branches
     selected_branches_comp = st.multiselect(
         "🏬 Select Branches (Comparison)",
         branches_comp,
@@ -775,138 +666,56 @@ with tabs[3]:
         key="branches_comp"
     )
 
-    # ---- فلترة البيانات بناءً على الفروع المختارة ----
-    branch_data = df[df["Branch"].isin(selected_branches_comp)]
 
+    # ------------------ عدد الفترات ------------------
+    n_periods = st.number_input("Number of Periods", min_value=2, max_value=len(PERIOD_NAMES),
+                                value=2, step=1, key="n_periods")
 
-    # ------------------ الفترة الأولى ------------------
-    st.markdown("<h5>📅 Select the First Period</h5>", unsafe_allow_html=True)
-    with st.container():
-        col1, col2, col3, col4 = st.columns([1,1,1,1])
+    # ------------------ اختيار الفترات ------------------
+    # كل فترة [أول شهر، آخر شهر] تتحول إلى MonthRange (نطاق أشهر نصف مفتوح)
+    periods, invalid = [], []
+    for i in range(1, n_periods + 1):
+        st.markdown(f"<h5>📅 Select the {PERIOD_NAMES[i - 1]} Period</h5>", unsafe_allow_html=True)
+        with st.container():
+            col1, col2, col3, col4 = st.columns([1,1,1,1])
 
-        with col1:
-            start_month1 = st.selectbox("Start Month", list(range(1, 13)),
-                                        format_func=lambda m: calendar.month_name[m], key="start_month1")
-        with col2:
-            start_year1 = st.selectbox("Start Year", sorted(df["Year"].unique()), key="start_year1")
-
-        with col3:
-            end_month1 = st.selectbox("End Month", list(range(1, 13)),
-                                    format_func=lambda m: calendar.month_name[m], key="end_month1")
-        with col4:
-            end_year1 = st.selectbox("End Year", sorted(df["Year"].unique()), key="end_year1")
+            with col1:
+                start_month = st.selectbox("Start Month", list(range(1, 13)),
+                                           format_func=lambda m: calendar.month_name[m], key=f"start_month{i}")
+            with col2:
+                start_year = st.selectbox("Start Year", engine.years, key=f"start_year{i}")
 
-    # ------------------ الفترة الثانية ------------------
-    st.markdown("<h5>📅 Select the Second Period</h5>", unsafe_allow_html=True)
-    with st.container():
-        col1, col2, col3, col4 = st.columns([1,1,1,1])
+            with col3:
+                end_month = st.selectbox("End Month", list(range(1, 13)),
+                                         format_func=lambda m: calendar.month_name[m], key=f"end_month{i}")
+            with col4:
+                end_year = st.selectbox("End Year", engine.years, key=f"end_year{i}")
 
-        with col1:
-            start_month2 = st.selectbox("Start Month", list(range(1, 13)),
-                                        format_func=lambda m: calendar.month_name[m], key="start_month2")
-        with col2:
-            start_year2 = st.selectbox("Start Year", sorted(df["Year"].unique()), key="start_year2")
-
-        with col3:
-            end_month2 = st.selectbox("End Month", list(range(1, 13)),
-                                    format_func=lambda m: calendar.month_name[m], key="end_month2")
-        with col4:
-            end_year2 = st.selectbox("End Year", sorted(df["Year"].unique()), key="end_year2")
-
-    # ------------------ فلترة البيانات ------------------
-    # تحويل إلى تواريخ بداية ونهاية
-    start_date1 = pd.to_datetime(f"{start_year1}-{start_month1}-01")
-    end_date1   = pd.to_datetime(f"{end_year1}-{end_month1}-28")
-    start_date2 = pd.to_datetime(f"{start_year2}-{start_month2}-01")
-    end_date2   = pd.to_datetime(f"{end_year2}-{end_month2}-28")
-
-    # فلترة
-    period1 = branch_data[(branch_data["Month"] >= start_date1) & (branch_data["Month"] <= end_date1)]
-    period2 = branch_data[(branch_data["Month"] >= start_date2) & (branch_data["Month"] <= end_date2)]
-
-    # القيم
-    net1, net2   = period1["Net_Sales"].sum(),       period2["Net_Sales"].sum()
-    disc1, disc2 = period1["Discount_Amount"].sum(), period2["Discount_Amount"].sum()
-    ord1, ord2   = period1["Orders"].sum(),          period2["Orders"].sum()
+        try:
+            periods.append(MonthRange.between(f"{start_year}-{start_month}-01", f"{end_year}-{end_month}-01"))
+        except ValueError:
+            invalid.append(PERIOD_NAMES[i - 1])
 
     # ------------------ التشارت ------------------
-    fig_comp = go.Figure()
-
-    # Net Sales
-    fig_comp.add_trace(go.Bar(
-        x=["Period 1"], y=[net1],
-        name=f"Net Sales {start_date1:%b %Y} - {end_date1:%b %Y}",
-        marker_color="#27ae60",
-        texttemplate="%{y:,.0f}", textposition="inside",
-        textfont=dict(size=20, color="white")
-    ))
-    fig_comp.add_trace(go.Bar(
-        x=["Period 2"], y=[net2],
-        name=f"Net Sales {start_date2:%b %Y} - {end_date2:%b %Y}",
-        marker_color="#2ecc71",
-        texttemplate="%{y:,.0f}", textposition="inside",
-        textfont=dict(size=20, color="white")
-    ))
-
-    # Discounts
-    fig_comp.add_trace(go.Bar(
-        x=["Period 1"], y=[disc1],
-        name=f"Discounts {start_date1:%b %Y} - {end_date1:%b %Y}",
-        marker_color="darkred", visible=False,
-        texttemplate="%{y:,.0f}", textposition="inside",
-        textfont=dict(size=20, color="white")
-    ))
-    fig_comp.add_trace(go.Bar(
-        x=["Period 2"], y=[disc2],
-        name=f"Discounts {start_date2:%b %Y} - {end_date2:%b %Y}",
-        marker_color="red", visible=False,
-        texttemplate="%{y:,.0f}", textposition="inside",
-        textfont=dict(size=20, color="white")
-    ))
-
-    # Orders
-    fig_comp.add_trace(go.Bar(
-        x=["Period 1"], y=[ord1],
-        name=f"Orders {start_date1:%b %Y} - {end_date1:%b %Y}",
-        marker_color="navy", visible=False,
-        texttemplate="%{y:,.0f}", textposition="inside",
-        textfont=dict(size=20, color="white")
-    ))
-    fig_comp.add_trace(go.Bar(
-        x=["Period 2"], y=[ord2],
-        name=f"Orders {start_date2:%b %Y} - {end_date2:%b %Y}",
-        marker_color="blue", visible=False,
-        texttemplate="%{y:,.0f}", textposition="inside",
-        textfont=dict(size=20, color="white")
-    ))
-
-    fig_comp.update_xaxes(type="category")
-    fig_comp.update_layout(
-        barmode="group",
-        updatemenus=[
-            dict(
-                type="buttons",
-                direction="left",
-                buttons=[
-                    dict(label="Net Sales", method="update",
-                        args=[{"visible": [True, True, False, False, False, False]},
-                            {"title": {"text": f"Net Sales Comparison"}}]),
-                    dict(label="Discounts", method="update",
-                        args=[{"visible": [False, False, True, True, False, False]},
-                            {"title": {"text": f"Discounts Comparison"}}]),
-                    dict(label="Orders", method="update",
-                        args=[{"visible": [False, False, False, False, True, True]},
-                            {"title": {"text": f"Orders Comparison"}}]),
-                ],
-                x=0.5, y=1.15, xanchor="center", yanchor="top"
-            )
-        ],
-        title={"text": f"Comparison: {start_date1:%b %Y}-{end_date1:%b %Y} vs {start_date2:%b %Y}-{end_date2:%b %Y}"},
-        showlegend=True
-    )
-    fig_comp.update_yaxes(tickformat="d")
-
-    st.plotly_chart(fig_comp, use_container_width=True)
+    # كل الفترات من المكعب في خطوة وحدة، والتشارت من الكاش لو ما تغير شي
+    metric_comp = metric_picker(list(figures.METRIC_LABELS), "comp_metric")
+
+    def build_comparison():
+        return figures.period_bars([
+            (p.start, p.end, p.totals.as_dict())
+            for p in engine.period_compare(selected_branches_comp, *periods)
+        ], metric_comp)
+
+    if invalid:
+        st.error(f"⚠️ The start month must not be after the end month ({', '.join(invalid)} period).")
+        fig_comp = None
+    else:
+        fig_comp = figure_cache.get(
+            spec_key("period_bars", selected_branches_comp, tuple(periods), version, metric=metric_comp),
+            profiler.timed("figure: period_bars", build_comparison),
+        )
+    if fig_comp is not None:
+        show_chart(fig_comp, "period_bars")
     st.markdown("<hr style='border:2px solid #007BFF'>", unsafe_allow_html=True)
 
     st.subheader("📊 Comparing Two or More Branches in a Specific Period")
@@ -936,7 +745,7 @@ with tabs[3]:
     with col2:
         start_year = st.selectbox(
             "Start Year",
-            sorted(df["Year"].unique()),
+            engine.years,
             key="start_year",
             index=0
         )
@@ -951,99 +760,45 @@ with tabs[3]:
     with col4:
         end_year = st.selectbox(
             "End Year",
-            sorted(df["Year"].unique()),
+            engine.years,
             key="end_year",
-            index=1
+            index=len(engine.years) - 1
         )
 
     # ------------------ فلترة البيانات ------------------
     start_date = pd.to_datetime(f"{start_year}-{start_month}-01")
-    end_date = pd.to_datetime(f"{end_year}-{end_month}-28")  # نهاية الشهر كافية
+    end_date = pd.to_datetime(f"{end_year}-{end_month}-01") + pd.offsets.MonthEnd(0)  # آخر يوم في الشهر
 
     if selected_branches_total:
-        # فلترة البيانات حسب الفروع والفترة
-        branch_multi = df[
-            (df["Branch"].isin(selected_branches_total)) &
-            (df["Month"] >= start_date) & 
-            (df["Month"] <= end_date)
-        ]
-
-        # حساب الإجماليات لكل فرع
-        totals_by_branch = branch_multi.groupby("Branch").agg({
-            "Net_Sales": "sum",
-            "Discount_Amount": "sum",
-            "Orders": "sum"
-        }).reset_index()
-
-        # ---- Bar Chart ----
-        fig_total = go.Figure()
-
-        # Net Sales
-        fig_total.add_trace(go.Bar(
-            x=totals_by_branch["Branch"], 
-            y=totals_by_branch["Net_Sales"],
-            name="Net Sales",
-            marker_color="#2ecc71",
-            texttemplate="%{y:,.0f}",
-            textposition="inside",
-            textfont=dict(size=18, color="white")
-        ))
-
-        # Discounts
-        fig_total.add_trace(go.Bar(
-            x=totals_by_branch["Branch"], 
-            y=totals_by_branch["Discount_Amount"],
-            name="Discounts",
-            marker_color="red",
-            visible=False,
-            texttemplate="%{y:,.0f}",
-            textposition="inside",
-            textfont=dict(size=18, color="white")
-        ))
-
-        # Orders
-        fig_total.add_trace(go.Bar(
-            x=totals_by_branch["Branch"], 
-            y=totals_by_branch["Orders"],
-            name="Orders",
-            marker_color="blue",
-            visible=False,
-            texttemplate="%{y:,.0f}",
-            textposition="inside",
-            textfont=dict(size=18, color="white")
-        ))
-
-        # إعداد الأزرار
-        fig_total.update_layout(
-            barmode="group",
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="left",
-                    buttons=[
-                        dict(label="Net Sales",
-                            method="update",
-                            args=[{"visible": [True, False, False]},
-                                {"title": {"text": f"Net Sales {start_date:%b %Y} → {end_date:%b %Y}"}}]),
-                        dict(label="Discounts",
-                            method="update",
-                            args=[{"visible": [False, True, False]},
-                                {"title": {"text": f"Discounts {start_date:%b %Y} → {end_date:%b %Y}"}}]),
-                        dict(label="Orders",
-                            method="update",
-                            args=[{"visible": [False, False, True]},
-                                {"title": {"text": f"Orders {start_date:%b %Y} → {end_date:%b %Y}"}}]),
-                    ],
-                    x=0.5, y=1.15, xanchor="center", yanchor="top"
-                )
-            ],
-            title={"text": f"Net Sales {start_date:%b %Y} → {end_date:%b %Y}"},
-            showlegend=True
+        # ---- Bar Chart (من الكاش لو نفس الفروع ونفس الفترة) ----
+        metric_total = metric_picker(list(figures.METRIC_LABELS), "total_metric")
+        fig_total = figure_cache.get(
+            spec_key("branch_bars", selected_branches_total, (start_date, end_date), version, metric=metric_total),
+            profiler.timed("figure: branch_bars", lambda: figures.branch_bars(
+                engine.branch_totals(selected_branches_total, start_date, end_date), start_date, end_date,
+                metric_total,
+            )),
         )
+        show_chart(fig_total, "branch_bars")
+
+    else:
+        st.info("Please select at least one branch to display the chart.")
 
-        fig_total.update_yaxes(tickformat="d")
 
-        st.plotly_chart(fig_total, use_container_width=True)
+with tabs[0], profiler.section("tab: Overview"):
+    overview_tab()
 
-    else:
-        st.info("Please select at least one branch to display the chart.")
\ No newline at end of file
+for tab, year in zip(tabs[1:-1], years):
+    with tab, profiler.section(f"tab: {year}"):
+        year_tab(year)
+
+with tabs[-1], profiler.section("tab: Comparison"):
+    comparison_tab()
+
+if DEBUG:
+    with st.expander("🔧 Debug"):
+        st.write({"compact_charts": COMPACT, "data_version": version, "backend": type(engine).__name__,
+                  "warmup": warm.status() if warm else None,
+                  "result_cache": result_cache.stats(), "figure_cache": figure_cache.stats()})
+
+profiler.end_run(show_profile)
@@ -0,0 +1,357 @@
+"""Pre-aggregated branch x month cube and period rollups.
+
+The loaded frame is folded once into a dense array indexed by
+``[branch, month, metric]`` and stored as prefix sums along the month axis,
+so any period total is two lookups per branch instead of a scan of the frame.
+
+Rows may be monthly, daily or per order: the cube always works in months,
+and ``rollup()`` materializes one row per branch per month, quarter or year
+for the per-branch charts.  ``add_rolling_columns()`` adds year-to-date,
+trailing-window and month-over-month columns to the monthly rollup.
+"""
+import numpy as np
+import pandas as pd
+
+from data_store import add_derived_columns
+
+METRICS = ["Net_Sales", "Discount_Amount", "Orders"]
+
+# Rollup level -> months per period
+LEVELS = {"month": 1, "quarter": 3, "year": 12}
+
+# Rolling column suffix -> trailing window in months (YTD and MoM are special)
+ROLLING = {"YTD": None, "T3M": 3, "T12M": 12, "MoM": None}
+
+
+def month_ordinal(ts):
+    """Months since year 0 for a timestamp (or DatetimeIndex/Series)."""
+    return ts.year * 12 + ts.month - 1
+
+
+def ordinal_to_timestamp(ords):
+    """Inverse of ``month_ordinal`` for an array: the first day of each month."""
+    return pd.DatetimeIndex(
+        (np.asarray(ords, dtype=np.int64) - 1970 * 12).astype("datetime64[M]").astype("datetime64[ns]")
+    )
+
+
+# ---- Rollups ----
+def is_monthly(df):
+    """True if ``df`` (sorted by Branch, Month) already has one row per branch per month."""
+    month = df["Month"]
+    if month.hasnans or not (month.dt.day == 1).all():
+        return False
+    codes = df["Branch"].cat.codes.to_numpy()
+    values = month.to_numpy()
+    return not ((codes[1:] == codes[:-1]) & (values[1:] == values[:-1])).any()
+
+
+def rollup(df, level="month"):
+    """Sum ``df`` to one row per branch per month, quarter or year.
+
+    The result is sorted by ``(Branch, Month)`` with ``Month`` holding the
+    period start, and carries the derived columns plus ``Quarter_Label`` or
+    ``Year_Label`` for the coarser levels.  Monthly input rolled up to
+    months is returned as is.
+    """
+    step = LEVELS[level]
+    if step == 1 and is_monthly(df):
+        return df
+
+    df = df[df["Month"].notna()]
+    ords = month_ordinal(df["Month"].dt).to_numpy()
+    ords = ords - ords % step
+    codes = df["Branch"].cat.codes.to_numpy()
+    sums = df[METRICS].groupby([codes, ords], sort=True).sum()
+
+    out = pd.DataFrame({
+        "Branch": pd.Categorical.from_codes(
+            sums.index.get_level_values(0), categories=df["Branch"].cat.categories
+        ),
+        "Month": ordinal_to_timestamp(sums.index.get_level_values(1)),
+    })
+    for col in METRICS:
+        out[col] = sums[col].to_numpy()
+    out = add_derived_columns(out)
+    if level == "quarter":
+        out["Quarter_Label"] = ("Q" + out["Quarter"].astype(str) + " " + out["Year"].astype(str)).astype("category")
+    elif level == "year":
+        out["Year_Label"] = out["Year"].astype(str).astype("category")
+    return out
+
+
+def add_rolling_columns(df):
+    """Add ``<metric>_YTD``, ``_T3M``, ``_T12M`` and ``_MoM`` columns in place.
+
+    ``df`` must be monthly and sorted by ``(Branch, Month)``.  Windows are
+    calendar months, not rows, so a branch's missing months count as zero:
+    each window is a difference of per-branch running sums located with one
+    ``searchsorted`` over ``branch * span + month`` keys.  ``_MoM`` is the
+    percent change from the previous calendar month, NaN when that month is
+    missing or zero.
+    """
+    ords = month_ordinal(df["Month"].dt).to_numpy().astype(np.int64)
+    codes = df["Branch"].cat.codes.to_numpy().astype(np.int64)
+    span = int(ords.max()) + 13 if len(ords) else 13
+    keys = codes * span + ords
+
+    # First row of each window (same branch, so the key bounds keep it in-branch)
+    starts = {
+        "YTD": np.searchsorted(keys, keys - ords % 12, side="left"),
+        "T3M": np.searchsorted(keys, keys - 2, side="left"),
+        "T12M": np.searchsorted(keys, keys - 11, side="left"),
+    }
+    prev = np.searchsorted(keys, keys - 1, side="left")
+    has_prev = (prev < len(keys)) & (keys[np.minimum(prev, len(keys) - 1)] == keys - 1)
+    rows = np.arange(len(keys))
+
+    for col in METRICS:
+        values = df[col].to_numpy(dtype=float)
+        running = np.concatenate([[0.0], np.cumsum(values)])
+        for suffix, lo in starts.items():
+            df[f"{col}_{suffix}"] = running[rows + 1] - running[lo]
+        before = np.where(has_prev, values[np.minimum(prev, len(keys) - 1)], np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df[f"{col}_MoM"] = np.where(before != 0, (values - before) / before * 100, np.nan)
+    return df
+
+
+def update_rolling_columns(df, since):
+    """Recompute the rolling columns of each branch from month ordinal ``since`` on.
+
+    ``since`` maps a branch to the first month whose rows changed; other
+    branches are left alone.  Windows reach back at most 11 months, so
+    only the changed rows and the year before them are read.  ``df`` is
+    monthly and sorted as for ``add_rolling_columns``; its rolling columns
+    are replaced (missing ones are added).
+    """
+    first = pd.Series(since, dtype="float64").reindex(df["Branch"].cat.categories).to_numpy()
+    first = first[df["Branch"].cat.codes.to_numpy()]
+    ords = month_ordinal(df["Month"].dt).to_numpy()
+    context = np.flatnonzero(ords >= first - 11)
+    part = add_rolling_columns(df.iloc[context].copy())
+    changed = ords[context] >= first[context]
+    rows = context[changed]
+
+    for col in METRICS:
+        for suffix in ROLLING:
+            name = f"{col}_{suffix}"
+            values = df[name].to_numpy(dtype=float, copy=True) if name in df else np.full(len(df), np.nan)
+            values[rows] = part[name].to_numpy()[changed]
+            df[name] = values
+    return df
+
+
+class SalesCube:
+    """Prefix-summed ``[branch, month, metric]`` totals.
+
+    ``cum[b, m, k]`` is the sum of metric ``k`` for branch ``b`` over the
+    first ``m`` months, so the month axis has one more slot than there are
+    months.  ``all_cum`` holds the same over all branches, which makes
+    all-branches totals O(1).
+    """
+
+    def __init__(self, branches, first_month, cum, count_cum):
+        self.branches = list(branches)
+        self.branch_pos = {b: i for i, b in enumerate(self.branches)}
+        self.first_month = first_month          # month ordinal of column 0
+        self.n_months = cum.shape[1] - 1
+        self.cum = cum
+        self.all_cum = cum.sum(axis=0)
+        # Row counts let callers tell "no data" apart from "sums to zero"
+        self.count_cum = count_cum
+        self._by_year = None
+
+    @classmethod
+    def from_values(cls, branches, first_month, values, counts):
+        """Build from dense per-month ``values[b, m, k]`` and row ``counts[b, m]``."""
+        cum = np.zeros((values.shape[0], values.shape[1] + 1, len(METRICS)))
+        np.cumsum(values, axis=1, out=cum[:, 1:])
+        count_cum = np.zeros((counts.shape[0], counts.shape[1] + 1), dtype=np.int64)
+        np.cumsum(counts, axis=1, out=count_cum[:, 1:])
+        return cls(branches, first_month, cum, count_cum)
+
+    @staticmethod
+    def _fold(df, branches, first_month, n_months, sign=1):
+        """Scatter-add the rows of ``df`` into dense value/count arrays."""
+        b_idx = pd.Categorical(df["Branch"], categories=branches).codes
+        m_idx = month_ordinal(df["Month"].dt).to_numpy() - first_month
+        values = np.zeros((len(branches), n_months, len(METRICS)))
+        for k, col in enumerate(METRICS):
+            np.add.at(values[:, :, k], (b_idx, m_idx), sign * df[col].to_numpy(dtype=float))
+        counts = np.zeros((len(branches), n_months), dtype=np.int64)
+        np.add.at(counts, (b_idx, m_idx), sign)
+        return values, counts
+
+    @classmethod
+    def from_frame(cls, df):
+        df = df.dropna(subset=["Month"])
+        branches = sorted(df["Branch"].unique())
+        if not branches:
+            return cls([], 0, np.zeros((0, 1, len(METRICS))), np.zeros((0, 1), dtype=np.int64))
+
+        ords = month_ordinal(df["Month"].dt)
+        first, last = int(ords.min()), int(ords.max())
+        values, counts = cls._fold(df, branches, first, last - first + 1)
+        return cls.from_values(branches, first, values, counts)
+
+    def with_rows(self, added, removed=None):
+        """Return a new cube with ``added`` rows folded in and ``removed`` taken out.
+
+        Only the prefix sums from the earliest touched month onward change;
+        months before it are copied over as they are.  New branches and
+        months outside the current range extend the cube.
+        """
+        added = added.dropna(subset=["Month"])
+        removed = removed.dropna(subset=["Month"]) if removed is not None else added.iloc[:0]
+        if not self.branches:
+            return SalesCube.from_frame(added)
+        if added.empty and removed.empty:
+            return self
+
+        ords = np.concatenate([month_ordinal(added["Month"].dt).to_numpy(),
+                               month_ordinal(removed["Month"].dt).to_numpy()])
+        first = min(self.first_month, int(ords.min()))
+        last = max(self.first_month + self.n_months - 1, int(ords.max()))
+        n_months = last - first + 1
+        branches = sorted(set(self.branches).union(added["Branch"].unique()))
+
+        # Re-seat the existing prefix sums on the (possibly larger) axes
+        pos = {b: i for i, b in enumerate(branches)}
+        rows = [pos[b] for b in self.branches]
+        off = self.first_month - first
+        cum = np.zeros((len(branches), n_months + 1, len(METRICS)))
+        count_cum = np.zeros((len(branches), n_months + 1), dtype=np.int64)
+        cum[rows, off:off + self.n_months + 1] = self.cum
+        cum[rows, off + self.n_months + 1:] = self.cum[:, -1:]
+        count_cum[rows, off:off + self.n_months + 1] = self.count_cum
+        count_cum[rows, off + self.n_months + 1:] = self.count_cum[:, -1:]
+
+        # Fold the change into a window covering only the touched months
+        m0, m1 = int(ords.min()) - first, int(ords.max()) - first
+        win_first, win_len = first + m0, m1 - m0 + 1
+        values, counts = self._fold(added, branches, win_first, win_len)
+        if not removed.empty:
+            minus, minus_counts = self._fold(removed, branches, win_first, win_len, sign=-1)
+            values += minus
+            counts += minus_counts
+        cum[:, m0 + 1:m1 + 2] += np.cumsum(values, axis=1)
+        cum[:, m1 + 2:] += values.sum(axis=1)[:, None]
+        count_cum[:, m0 + 1:m1 + 2] += np.cumsum(counts, axis=1)
+        count_cum[:, m1 + 2:] += counts.sum(axis=1)[:, None]
+        return SalesCube(branches, first, cum, count_cum)
+
+    @property
+    def years(self):
+        """Calendar years that have at least one row, ascending."""
+        has_rows = np.diff(self.count_cum.sum(axis=0)) > 0
+        ords = np.arange(self.first_month, self.first_month + self.n_months)[has_rows]
+        return sorted(set((ords // 12).tolist()))
+
+    def by_year(self):
+        """``(years, totals)`` with ``totals[b, y, k]`` per branch and year with data.
+
+        One fancy-indexed difference of the prefix sums at the year
+        boundaries covers every branch and year at once; the result is kept
+        on the cube (which never changes after construction).
+        """
+        if self._by_year is None:
+            years = np.array(self.years, dtype=np.int64)
+            lo = np.clip(years * 12 - self.first_month, 0, self.n_months)
+            hi = np.clip(years * 12 + 12 - self.first_month, 0, self.n_months)
+            self._by_year = (years.tolist(), self.cum[:, hi] - self.cum[:, lo])
+        return self._by_year
+
+    # ---- Index helpers ----
+    def _bounds(self, start=None, end=None):
+        """Half-open month-slot bounds for an inclusive ``[start, end]``."""
+        lo = 0 if start is None else month_ordinal(pd.Timestamp(start)) - self.first_month
+        hi = self.n_months if end is None else month_ordinal(pd.Timestamp(end)) - self.first_month + 1
+        lo = min(max(lo, 0), self.n_months)
+        hi = min(max(hi, lo), self.n_months)
+        return lo, hi
+
+    def _rows(self, branches):
+        return [self.branch_pos[b] for b in branches if b in self.branch_pos]
+
+    @staticmethod
+    def _as_dict(values):
+        out = dict(zip(METRICS, values.tolist()))
+        out["Orders"] = int(round(out["Orders"]))
+        return out
+
+    # ---- Lookups ----
+    def period_totals(self, start=None, end=None, branches=None):
+        """Metric totals over the inclusive month range, as a dict.
+
+        ``branches=None`` means all branches.  A single branch name is
+        accepted as well as a list.
+        """
+        lo, hi = self._bounds(start, end)
+        if branches is None:
+            vals = self.all_cum[hi] - self.all_cum[lo]
+        else:
+            if isinstance(branches, str):
+                branches = [branches]
+            rows = self._rows(branches)
+            vals = (self.cum[rows, hi] - self.cum[rows, lo]).sum(axis=0)
+        return self._as_dict(vals)
+
+    def range_totals(self, ranges, branches=None):
+        """Totals for each half-open month-ordinal range ``[start, stop)``.
+
+        Returns an array ``[period, metric]``; all ranges are answered with
+        one gather from the prefix sums, O(branches x periods).
+        """
+        ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+        lo = np.clip(ranges[:, 0] - self.first_month, 0, self.n_months)
+        hi = np.clip(ranges[:, 1] - self.first_month, lo, self.n_months)
+        if branches is None:
+            return self.all_cum[hi] - self.all_cum[lo]
+        if isinstance(branches, str):
+            branches = [branches]
+        cum = self.cum[self._rows(branches)]
+        return (cum[:, hi] - cum[:, lo]).sum(axis=0)
+
+    def year_totals(self, year, branches=None):
+        """Metric totals for one calendar year, read from ``by_year()``."""
+        years, totals = self.by_year()
+        if year not in years:
+            return self._as_dict(np.zeros(len(METRICS)))
+        y = years.index(year)
+        if branches is None:
+            return self._as_dict(totals[:, y].sum(axis=0))
+        if isinstance(branches, str):
+            branches = [branches]
+        return self._as_dict(totals[self._rows(branches), y].sum(axis=0))
+
+    def monthly_totals(self, branches=None):
+        """Per-month totals (all branches by default), months with data only."""
+        if branches is None:
+            cum, count_cum = self.all_cum, self.count_cum.sum(axis=0)
+        else:
+            if isinstance(branches, str):
+                branches = [branches]
+            rows = self._rows(branches)
+            cum, count_cum = self.cum[rows].sum(axis=0), self.count_cum[rows].sum(axis=0)
+        present = np.diff(count_cum) > 0
+
+        months = ordinal_to_timestamp(np.arange(self.first_month, self.first_month + self.n_months)[present])
+        out = pd.DataFrame(np.diff(cum, axis=0)[present], columns=METRICS)
+        out.insert(0, "Month", months)
+        out.insert(1, "Month_Label", months.strftime("%b %Y"))
+        out["Orders"] = out["Orders"].round().astype("int64")
+        return out
+
+    def branch_totals(self, start=None, end=None, branches=None):
+        """Per-branch totals over the period, one row per branch with data."""
+        lo, hi = self._bounds(start, end)
+        rows = range(len(self.branches)) if branches is None else sorted(self._rows(branches))
+        rows = np.fromiter(rows, dtype=np.intp)
+        vals = self.cum[rows, hi] - self.cum[rows, lo]
+        present = (self.count_cum[rows, hi] - self.count_cum[rows, lo]) > 0
+
+        out = pd.DataFrame(vals[present], columns=METRICS)
+        out.insert(0, "Branch", [self.branches[i] for i in rows[present]])
+        out["Orders"] = out["Orders"].round().astype("int64")
+        return out
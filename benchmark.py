@@ -0,0 +1,291 @@
+"""Benchmarks for the dashboard's data paths on synthetic data.
+
+Generates a ``Branch,Month,Discount_Amount,Net_Sales,Orders`` extract at a
+chosen scale, times each computation the tabs perform (outside Streamlit),
+and optionally times full script runs through Streamlit's ``AppTest``.
+Results are written as JSON so runs can be compared across commits.
+
+    python benchmark.py --scale 10 100 --out bench.json
+    python benchmark.py --scale 1000 --months 36 --daily --apptest
+    python benchmark.py --scale 1000 --daily --rss
+    python benchmark.py --scale 100 --daily --shards 8 --workers 1 8
+
+Engine queries are also timed on the DuckDB backend when duckdb is
+installed (``duckdb_*`` results).
+
+``--scale 1`` matches the shipped extract's 33 branches; ``--months`` sets the
+history length (the shipped extract has 22).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from aggregates import SalesCube, rollup  # noqa: E402
+import sql_engine  # noqa: E402
+from data_store import BranchIndex, aggregate_csv, load_sales, read_meta  # noqa: E402
+from sales_engine import SalesEngine  # noqa: E402
+from shards import load_shards  # noqa: E402
+
+CSV_NAME = "Sales_2024_2025_upp.csv"
+BASE_BRANCHES = 33
+
+
+# ---- Synthetic data ----
+def make_dataset(n_branches, n_months, daily=False, start="2024-01", seed=0):
+    """Synthetic extract with one row per branch per month (or per day)."""
+    rng = np.random.default_rng(seed)
+    branches = np.array([f"Branch {i:05d}" for i in range(n_branches)])
+    if daily:
+        first = pd.Period(start, freq="M").to_timestamp()
+        last = (pd.Period(start, freq="M") + n_months - 1).to_timestamp(how="end")
+        periods = pd.date_range(first, last.normalize(), freq="D")
+        labels = periods.strftime("%Y-%m-%d")
+    else:
+        periods = pd.period_range(start, periods=n_months, freq="M")
+        labels = periods.strftime("%Y-%m")
+
+    n = n_branches * len(labels)
+    scale = 1 / 30 if daily else 1
+    orders = rng.poisson(2500 * scale + 1, n)
+    net = orders * rng.normal(16, 2, n).clip(5)
+    return pd.DataFrame({
+        "Branch": np.repeat(branches, len(labels)),
+        "Month": np.tile(labels, n_branches),
+        "Discount_Amount": (net * rng.uniform(0.02, 0.06, n)).round(5),
+        "Net_Sales": net.round(5),
+        "Orders": orders,
+    })
+
+
+# ---- Timing ----
+def timeit(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {"best": min(runs), "median": statistics.median(runs), "runs": repeat}
+
+
+def computation_cases(df, engine):
+    """The computations the tabs run, keyed by name."""
+    branches = engine.branches
+    one, many = branches[0], branches[: max(2, len(branches) // 10)]
+    years = engine.years
+    y0, y1 = years[0], years[-1]
+    p1 = (pd.Timestamp(f"{y0}-01-01"), pd.Timestamp(f"{y0}-06-01"))
+    p2 = (pd.Timestamp(f"{y1}-01-01"), pd.Timestamp(f"{y1}-06-01"))
+
+    return {
+        "kpi_totals": lambda: engine.kpis(),
+        "contribution_table": lambda: engine.contribution(),
+        "branch_metrics": lambda: engine.branch_metrics(),
+        "leaderboard_top10": lambda: engine.leaderboard("Net_Sales", 10),
+        "forecast_all_branches": lambda: engine.forecast(),
+        "branch_series": lambda: engine.branch_series(one),
+        "branch_series_quarter": lambda: engine.branch_series(one, level="quarter"),
+        "year_slice_all": lambda: [engine.year_kpis(year) for year in years],
+        "year_slice_branch": lambda: (engine.branch_series(one, f"{y0}-01-01", f"{y0}-12-31"),
+                                      engine.year_kpis(y0, one)),
+        "aov": lambda: engine.monthly_series(one),
+        "aov_all_branches": lambda: engine.monthly_series(),
+        "yoy_selected": lambda: engine.yoy_growth(many, y0, y1),
+        "period_compare": lambda: engine.period_compare(many, p1, p2),
+        "multi_branch_period": lambda: engine.branch_totals(many, *p1),
+    }
+
+
+def frame_memory(df):
+    """MB of ``df`` on the heap vs viewed from the memory-mapped store."""
+    heap = mapped = 0
+    for col in df.columns:
+        values = df[col].array
+        nbytes = df[col].memory_usage(index=False, deep=True)
+        if isinstance(values, np.ndarray) or hasattr(values, "_ndarray"):
+            if not df[col].to_numpy().flags.writeable:
+                mapped += nbytes
+                continue
+        heap += nbytes
+    return {"heap": round(heap / 2**20, 2), "mapped": round(mapped / 2**20, 2)}
+
+
+def run_computations(csv_path, repeat):
+    results = {}
+    cache_dir = os.path.join(os.path.dirname(csv_path), ".data_cache")
+
+    def cold_load():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        load_sales(csv_path, cache_dir)
+
+    results["load_cold"] = timeit(cold_load, max(1, repeat // 5))
+    results["load_warm"] = timeit(lambda: load_sales(csv_path, cache_dir), repeat)
+    results["aggregate_stream"] = timeit(lambda: aggregate_csv(csv_path), max(1, repeat // 5))
+
+    df = load_sales(csv_path, cache_dir)
+    results["build_cube"] = timeit(lambda: SalesCube.from_frame(df), max(1, repeat // 5))
+    results["build_rollup"] = timeit(lambda: rollup(df, "month"), max(1, repeat // 5))
+    monthly = rollup(df, "month")
+    results["build_index"] = timeit(lambda: BranchIndex(monthly), max(1, repeat // 5))
+    engine = SalesEngine(SalesCube.from_frame(df), BranchIndex(monthly))
+    for name, fn in computation_cases(df, engine).items():
+        results[name] = timeit(fn, repeat)
+    if sql_engine.available():
+        store_path, _ = read_meta(csv_path, cache_dir)
+        sql = sql_engine.DuckDBEngine(store_path, BranchIndex(monthly))
+        for name, fn in computation_cases(df, sql).items():
+            results[f"duckdb_{name}"] = timeit(fn, repeat)
+    return results, len(df), frame_memory(df)
+
+
+def peak_rss(csv_path, stream):
+    """Peak RSS in MB of a fresh process building the store (streamed or not).
+
+    Read from ``VmHWM`` in the child: unlike ``ru_maxrss`` it is not
+    inherited from this (larger) process across fork/exec.  Linux only.
+    """
+    code = ("import sys, tempfile; sys.path.insert(0, sys.argv[1]); "
+            "from data_store import load_sales; "
+            "load_sales(sys.argv[2], tempfile.mkdtemp(), stream=sys.argv[3] == '1'); "
+            "print(next(l for l in open('/proc/self/status') if l.startswith('VmHWM')))")
+    out = subprocess.check_output([sys.executable, "-c", code, HERE, csv_path, "1" if stream else "0"], text=True)
+    return int(out.split()[-2]) / 1024   # "VmHWM:  123456 kB"
+
+
+def write_shards(df, workdir, n_shards):
+    """Split ``df`` by branch into ``n_shards`` CSVs; return their directory."""
+    shard_dir = os.path.join(workdir, "shards")
+    os.makedirs(shard_dir)
+    branches = df["Branch"].unique()
+    for i in range(n_shards):
+        part = df[df["Branch"].isin(branches[i::n_shards])]
+        part.to_csv(os.path.join(shard_dir, f"region_{i:03d}.csv"), index=False)
+    return shard_dir
+
+
+def run_shards(shard_dir, workers, repeat):
+    """Cold sharded loads (every shard re-parsed) per worker count."""
+    results = {}
+    cache_dir = os.path.join(os.path.dirname(shard_dir), ".shard_cache")
+    for n in workers:
+        def cold_load():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            load_shards(shard_dir, cache_dir, workers=n)
+        results[f"load_shards_{n}w"] = timeit(cold_load, repeat)
+    return results
+
+
+def run_apptest(workdir, repeat):
+    """Time full script runs of Dashboard.py against the synthetic data."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Cached resources outlive an AppTest within one process
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        script = os.path.join(HERE, "Dashboard.py")
+        results = {}
+
+        at = AppTest.from_file(script, default_timeout=600)
+        t0 = time.perf_counter()
+        at.run()
+        results["apptest_first_run"] = {"best": time.perf_counter() - t0, "median": None, "runs": 1}
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+        results["apptest_rerun"] = timeit(at.run, repeat)
+        branches = at.selectbox[0].options
+
+        def select_branch():
+            at.selectbox[0].select(branches[-1]).run()
+            at.selectbox[0].select(branches[0]).run()
+
+        results["apptest_select_branch"] = timeit(select_branch, repeat)
+        return results
+    finally:
+        os.chdir(cwd)
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100],
+                        help="branch multipliers relative to the shipped extract")
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--daily", action="store_true", help="one row per branch per day")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--apptest", action="store_true", help="also time full runs through AppTest")
+    parser.add_argument("--shards", type=int, help="also time cold loads of the data split into N shards")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="process counts for --shards")
+    parser.add_argument("--rss", action="store_true",
+                        help="measure peak RSS of streamed vs full loads in subprocesses")
+    parser.add_argument("--out", default="bench_output.json")
+    args = parser.parse_args(argv)
+
+    report = {
+        "commit": _git_rev(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "runs": [],
+    }
+    for scale in args.scale:
+        n_branches = BASE_BRANCHES * scale
+        with tempfile.TemporaryDirectory() as workdir:
+            csv_path = os.path.join(workdir, CSV_NAME)
+            data = make_dataset(n_branches, args.months, args.daily)
+            data.to_csv(csv_path, index=False)
+
+            results, n_rows, memory = run_computations(csv_path, args.repeat)
+            if args.shards:
+                shard_dir = write_shards(data, workdir, args.shards)
+                results.update(run_shards(shard_dir, args.workers, max(1, args.repeat // 5)))
+            del data
+            if args.apptest:
+                results.update(run_apptest(workdir, max(1, args.repeat // 5)))
+            rss = None
+            if args.rss:
+                rss = {"stream": round(peak_rss(csv_path, True), 1), "full": round(peak_rss(csv_path, False), 1),
+                       "csv": round(os.path.getsize(csv_path) / 2**20, 1)}
+
+        run = {"scale": scale, "branches": n_branches, "months": args.months,
+               "daily": args.daily, "rows": n_rows, "results": results,
+               "frame_mb": memory, "peak_rss_mb": rss}
+        report["runs"].append(run)
+        print(f"scale {scale}x: {n_rows:,} rows, frame {memory['heap']} MB heap + {memory['mapped']} MB mapped")
+        for name, r in results.items():
+            print(f"  {name:<32} {r['best'] * 1e3:10.3f} ms")
+        if rss:
+            print(f"  peak RSS (MB): stream {rss['stream']}, full {rss['full']}, csv {rss['csv']}")
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
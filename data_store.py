@@ -0,0 +1,412 @@
+"""Columnar storage for the sales extract.
+
+The source CSV is parsed once and written as an uncompressed Feather (Arrow
+IPC) file under ``.data_cache/``: ``Branch`` is dictionary encoded (int32
+codes plus one copy of each name), ``Month`` is a millisecond timestamp and
+``Orders`` is int32.  Later loads memory-map that file instead of re-parsing
+text, and the file is only rebuilt when the CSV changes.
+
+Each column is written as a single chunk in the dtype pandas uses, so the
+numeric and ``Month`` columns of the loaded frame are read-only views of
+the mapped file rather than heap copies; the OS page cache holds them once
+no matter how many sessions read the frame.
+
+Rows are stored sorted by ``(Branch, Month)`` so that ``BranchIndex`` can
+hand out a branch's rows as one contiguous slice.
+
+CSVs larger than ``STREAM_THRESHOLD`` are not loaded whole: they are read in
+chunks and folded into branch x month sums, and the store holds those sums
+instead of the raw rows.  Memory then depends on the number of branches and
+months, not on the file size.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from metrics import safe_divide
+
+CACHE_DIR = ".data_cache"
+# Bump when the stored layout changes so existing stores get rebuilt
+STORE_FORMAT = 4
+COLUMNS = ["Branch", "Month", "Discount_Amount", "Net_Sales", "Orders"]
+METRIC_COLUMNS = ["Discount_Amount", "Net_Sales", "Orders"]
+
+# Files above this size are aggregated chunk by chunk instead of loaded
+STREAM_THRESHOLD = 256 * 2**20
+CHUNK_ROWS = 250_000
+
+_SCHEMA = pa.schema([
+    ("Branch", pa.dictionary(pa.int32(), pa.string())),
+    ("Month", pa.timestamp("ms")),
+    ("Discount_Amount", pa.float64()),
+    ("Net_Sales", pa.float64()),
+    ("Orders", pa.int32()),
+])
+
+
+# ---- Source fingerprint ----
+def file_stat(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def content_hash(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _store_paths(csv_path, cache_dir):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return (os.path.join(cache_dir, name + ".feather"),
+            os.path.join(cache_dir, name + ".meta.json"))
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, payload):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+# ---- CSV -> Arrow ----
+def parse_months(values, source):
+    """Parse ``Month`` strings as ISO 8601 (``2024-01``, ``2024-01-15``, ...).
+
+    Every value is parsed with the same rules, so a file mixing monthly and
+    daily dates loses nothing.  Raises ``ValueError`` with the number of
+    rows whose Month is missing or unparseable instead of dropping them.
+    """
+    month = pd.to_datetime(values, format="ISO8601", errors="coerce")
+    bad = month.isna().to_numpy()
+    if bad.any():
+        examples = pd.Series(values)[bad].head(3).tolist()
+        raise ValueError(f"{source}: {int(bad.sum()):,} rows with a missing or unparseable Month, "
+                         f"e.g. {examples}")
+    return month
+
+
+def frame_to_table(df, sort=True):
+    """Convert a frame with a parsed ``Month`` to an Arrow table, sorted.
+
+    Pass ``sort=False`` for a frame already sorted by ``(Branch, Month)``.
+    """
+    if sort:
+        df = df.sort_values(["Branch", "Month"], kind="stable", ignore_index=True)
+    month = df["Month"]
+    return pa.table({
+        "Branch": pa.array(df["Branch"]).cast(_SCHEMA.field("Branch").type),
+        "Month": pa.array(month.values.astype("datetime64[ms]"), type=pa.timestamp("ms"), from_pandas=True),
+        "Discount_Amount": pa.array(df["Discount_Amount"], type=pa.float64()),
+        "Net_Sales": pa.array(df["Net_Sales"], type=pa.float64()),
+        "Orders": pa.array(df["Orders"], type=pa.int32()),
+    }, schema=_SCHEMA)
+
+
+def read_sales_csv(csv_path):
+    """Parse the raw CSV into an Arrow table with the storage schema."""
+    df = pd.read_csv(
+        csv_path,
+        dtype={"Branch": "category", "Month": "string"},
+    )
+    df["Month"] = parse_months(df["Month"], csv_path)
+    return frame_to_table(df)
+
+
+def write_table(table, store_path):
+    tmp = store_path + ".tmp"
+    # Uncompressed and one chunk per column so the file can be memory-mapped
+    # and viewed without a decode or concatenation step
+    table = table.combine_chunks()
+    feather.write_feather(table, tmp, compression="uncompressed", chunksize=max(len(table), 1))
+    os.replace(tmp, store_path)
+
+
+# ---- Streaming aggregation ----
+@dataclass(frozen=True)
+class ScanProgress:
+    """Where a chunked CSV scan is, passed to the ``progress`` callback per chunk."""
+    rows: int
+    bytes_read: int
+    total_bytes: int
+    elapsed: float
+    done: bool = False
+
+    @property
+    def fraction(self):
+        return min(self.bytes_read / self.total_bytes, 1.0) if self.total_bytes else 1.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_sec(self):
+        return self.bytes_read / 2**20 / self.elapsed if self.elapsed else 0.0
+
+
+def print_progress(p, stream=sys.stderr):
+    """Progress callback that keeps one status line on ``stream``."""
+    stream.write(f"\r{p.fraction:6.1%}  {p.rows:>14,} rows  "
+                 f"{p.rows_per_sec:>12,.0f} rows/s  {p.mb_per_sec:7.1f} MB/s")
+    if p.done:
+        stream.write("\n")
+    stream.flush()
+
+
+def _fold_chunk(chunk, source):
+    """Branch x month-start sums of one parsed chunk (``ValueError`` on a bad Month)."""
+    month = parse_months(chunk["Month"], source)
+    starts = (month.dt.year.to_numpy() - 1970) * 12 + month.dt.month.to_numpy() - 1
+    keys = [chunk["Branch"].to_numpy(), starts]
+    return chunk[METRIC_COLUMNS].groupby(keys, sort=False).sum()
+
+
+def aggregate_csv(csv_path, chunk_rows=CHUNK_ROWS, progress=None):
+    """Stream ``csv_path`` into one row per branch per month with bounded memory.
+
+    The file is read ``chunk_rows`` rows at a time and each chunk is folded
+    into running sums keyed by ``(Branch, month)``, so peak memory is one
+    chunk plus the sums.  ``progress`` (e.g. ``print_progress``) is called
+    with a ``ScanProgress`` after every chunk and once at the end.
+    """
+    total = os.path.getsize(csv_path)
+    t0 = time.perf_counter()
+    sums, rows = None, 0
+    with open(csv_path, "rb") as f:
+        reader = pd.read_csv(f, chunksize=chunk_rows, dtype={"Branch": str, "Month": str})
+        for chunk in reader:
+            part = _fold_chunk(chunk, csv_path)
+            sums = part if sums is None else sums.add(part, fill_value=0)
+            rows += len(chunk)
+            if progress is not None:
+                progress(ScanProgress(rows, f.tell(), total, time.perf_counter() - t0))
+
+    if sums is None:
+        sums = pd.DataFrame(columns=METRIC_COLUMNS, index=pd.MultiIndex.from_arrays([[], []]))
+    if progress is not None:
+        progress(ScanProgress(rows, total, total, time.perf_counter() - t0, done=True))
+    out = pd.DataFrame({
+        "Branch": sums.index.get_level_values(0).astype(str),
+        "Month": np.asarray(sums.index.get_level_values(1), dtype=np.int64).astype("datetime64[M]")
+                   .astype("datetime64[ns]"),
+    })
+    for col in METRIC_COLUMNS:
+        out[col] = sums[col].to_numpy()
+    out["Orders"] = out["Orders"].round().astype("int32")
+    return out
+
+
+def convert_csv(csv_path, store_path, stream=None, progress=None):
+    """Write ``csv_path`` to ``store_path`` as an uncompressed Feather file.
+
+    With ``stream`` (the default for files over ``STREAM_THRESHOLD``) the
+    store holds monthly sums from ``aggregate_csv`` rather than raw rows.
+    """
+    if stream is None:
+        stream = os.path.getsize(csv_path) > STREAM_THRESHOLD
+    if stream:
+        table = frame_to_table(aggregate_csv(csv_path, progress=progress))
+    else:
+        table = read_sales_csv(csv_path)
+    write_table(table, store_path)
+    return table
+
+
+def ensure_store(csv_path, cache_dir=CACHE_DIR, stream=None, progress=None):
+    """Return ``(store_path, meta)`` for an up-to-date columnar copy.
+
+    A matching size and mtime is trusted as-is.  When either differs the
+    content hash decides whether the file actually changed, so touching the
+    CSV (e.g. a fresh checkout) does not force a rebuild.  ``meta["drops"]``
+    lists the drop files already appended to the store; a rebuild from the
+    CSV clears it so they get appended again.  ``stream``/``progress`` are
+    passed to ``convert_csv`` on a rebuild.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    store_path, meta_path = _store_paths(csv_path, cache_dir)
+    stat = file_stat(csv_path)
+    meta = _read_meta(meta_path)
+
+    if meta is not None and meta.get("format") == STORE_FORMAT and os.path.exists(store_path):
+        if meta["size"] == stat["size"] and meta["mtime_ns"] == stat["mtime_ns"]:
+            return store_path, meta
+        digest = content_hash(csv_path)
+        if meta.get("hash") == digest:
+            meta = {**meta, **stat}
+            _write_json(meta_path, meta)
+            return store_path, meta
+    else:
+        digest = content_hash(csv_path)
+
+    if stream is None:
+        stream = stat["size"] > STREAM_THRESHOLD
+    convert_csv(csv_path, store_path, stream, progress)
+    # "streamed": the store holds monthly sums rather than the CSV's rows
+    meta = {**stat, "hash": digest, "format": STORE_FORMAT, "drops": {}, "streamed": stream}
+    _write_json(meta_path, meta)
+    return store_path, meta
+
+
+def store_is_current(csv_path, cache_dir=CACHE_DIR):
+    """Cheap check (stat only) that ``ensure_store`` would not need to rebuild."""
+    store_path, meta_path = _store_paths(csv_path, cache_dir)
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get("format") != STORE_FORMAT or not os.path.exists(store_path):
+        return False
+    stat = file_stat(csv_path)
+    return meta["size"] == stat["size"] and meta["mtime_ns"] == stat["mtime_ns"]
+
+
+def read_meta(csv_path, cache_dir=CACHE_DIR):
+    """``(store_path, meta)`` as last written; ``meta`` is ``None`` if there is none."""
+    store_path, meta_path = _store_paths(csv_path, cache_dir)
+    return store_path, _read_meta(meta_path)
+
+
+def write_store(csv_path, table, meta, cache_dir=CACHE_DIR):
+    """Write ``table`` and ``meta`` as the store for ``csv_path``."""
+    os.makedirs(cache_dir, exist_ok=True)
+    store_path, meta_path = _store_paths(csv_path, cache_dir)
+    write_table(table, store_path)
+    _write_json(meta_path, meta)
+    return store_path
+
+
+def save_store(csv_path, df, drops, cache_dir=CACHE_DIR):
+    """Rewrite the store from ``df`` (sorted) and record ``drops`` as ingested.
+
+    Used after appending drop files; the base CSV fingerprint is kept.
+    The whole store is written again, so each batch of drops costs a
+    sequential write of the full history (about 20 bytes a row); the
+    single file is what lets later loads, and DuckDB, memory-map one
+    sorted table instead of replaying drop segments.
+    """
+    store_path, meta_path = _store_paths(csv_path, cache_dir)
+    meta = {**_read_meta(meta_path), "drops": drops}
+    write_table(frame_to_table(df[COLUMNS], sort=False), store_path)
+    _write_json(meta_path, meta)
+    return meta
+
+
+def data_version(meta):
+    """Version string for the stored data: the CSV hash plus any drops."""
+    if not meta.get("drops"):
+        return meta["hash"]
+    h = hashlib.blake2b(meta["hash"].encode(), digest_size=16)
+    for name in sorted(meta["drops"]):
+        h.update(meta["drops"][name]["hash"].encode())
+    return h.hexdigest()
+
+
+# ---- Derived columns ----
+def add_derived_columns(df):
+    """Add ``Year``, ``Quarter``, ``Month_Label`` and ``AOV`` in place.
+
+    ``Month_Label`` is formatted once per distinct month and stored as an
+    ordered categorical, so the per-row cost is a code lookup.
+    """
+    month = df["Month"]
+    df["Year"] = month.dt.year.astype("Int16" if month.hasnans else "int16")
+    df["Quarter"] = month.dt.quarter.astype("Int8" if month.hasnans else "int8")
+
+    codes, uniques = pd.factorize(month, sort=True)
+    labels = pd.DatetimeIndex(uniques).strftime("%b %Y")
+    categories = labels.unique()
+    label_codes = categories.get_indexer(labels)
+    df["Month_Label"] = pd.Categorical.from_codes(
+        np.where(codes >= 0, label_codes[codes], -1), categories=categories, ordered=True
+    )
+
+    df["AOV"] = safe_divide(df["Net_Sales"].to_numpy(), df["Orders"].to_numpy())
+    return df
+
+
+# ---- Branch index ----
+class BranchIndex:
+    """Offsets of each branch's rows in a frame sorted by ``(Branch, Month)``.
+
+    ``rows()`` returns a positional slice of the frame (no boolean mask over
+    all rows), and date bounds are resolved with ``searchsorted`` inside
+    that slice.
+    """
+
+    def __init__(self, df):
+        codes = df["Branch"].cat.codes.to_numpy()
+        if len(codes) and (np.diff(codes) < 0).any():
+            raise ValueError("BranchIndex needs a frame sorted by (Branch, Month)")
+        categories = df["Branch"].cat.categories
+        offsets = np.zeros(len(categories) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes[codes >= 0], minlength=len(categories)), out=offsets[1:])
+
+        self.df = df
+        self.months = df["Month"].to_numpy()
+        self.offsets = {b: (int(offsets[i]), int(offsets[i + 1]))
+                        for i, b in enumerate(categories) if offsets[i + 1] > offsets[i]}
+        self.branches = sorted(self.offsets)
+
+    def span(self, branch, start=None, end=None):
+        """``(lo, hi)`` row positions for ``branch`` with ``start <= Month <= end``."""
+        lo, hi = self.offsets.get(branch, (0, 0))
+        if start is not None or end is not None:
+            months = self.months[lo:hi]
+            if start is not None:
+                lo_in = months.searchsorted(np.datetime64(pd.Timestamp(start)), side="left")
+            else:
+                lo_in = 0
+            if end is not None:
+                hi_in = months.searchsorted(np.datetime64(pd.Timestamp(end)), side="right")
+            else:
+                hi_in = hi - lo
+            lo, hi = lo + lo_in, lo + max(hi_in, lo_in)
+        return lo, hi
+
+    def rows(self, branch, start=None, end=None):
+        """The rows of one branch (optionally within a date range) as a slice."""
+        lo, hi = self.span(branch, start, end)
+        return self.df.iloc[lo:hi]
+
+
+def load_sales(csv_path, cache_dir=CACHE_DIR, stream=None, progress=None):
+    """Load the sales data through the columnar store.
+
+    ``Branch`` comes back as a pandas categorical and ``Month`` as
+    ``datetime64``; numeric columns are backed by the memory-mapped file.
+    ``df.attrs["data_version"]`` identifies the stored content so derived
+    caches can be keyed on it.  The frame is meant to be shared read-only:
+    callers filter it but never assign columns.
+    """
+    df, _ = load_store(csv_path, cache_dir, stream, progress)
+    return df
+
+
+def load_store(csv_path, cache_dir=CACHE_DIR, stream=None, progress=None):
+    """Like ``load_sales`` but also return the store metadata."""
+    store_path, meta = ensure_store(csv_path, cache_dir, stream, progress)
+    return read_store(store_path, meta), meta
+
+
+def read_store(store_path, meta):
+    """Memory-map a store file as a frame with the derived columns."""
+    table = feather.read_table(store_path, memory_map=True)
+    df = add_derived_columns(table.to_pandas(date_as_object=False, split_blocks=True))
+    df.attrs["data_version"] = data_version(meta)
+    return df
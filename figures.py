@@ -0,0 +1,324 @@
+"""Plotly figure factory and a shared cache of built figures.
+
+Each chart in the dashboard is described by a small spec (the chart kind,
+the selected branches, the period bounds and the data version).  The
+figure built for a spec is kept in ``FigureCache`` (a ``SharedCache``
+sized by the figures' data arrays) so an unchanged chart is not rebuilt
+on every rerun.
+
+In compact mode the dashboard asks for one metric per figure (the
+``metric`` argument) instead of every metric behind an ``updatemenus``
+toggle, and long line series are thinned with LTTB (``lttb_indices``) and
+sent as float32; plotly encodes numpy arrays as base64 typed arrays.  Bar
+totals stay float64: float32 is not exact past about 16.7M, which their
+``%{y:,.0f}`` labels would show.
+
+The cache holds ``go.Figure`` objects rather than their JSON:
+``st.plotly_chart`` re-validates a plain dict through ``go.Figure``, which
+costs more than building the figure in the first place.  Cached figures
+are shared between sessions and must not be mutated by callers.
+"""
+import sys
+
+import numpy as np
+import plotly.graph_objects as go
+
+from shared_cache import DEFAULT_BUDGET, SharedCache
+
+METRIC_LABELS = {"Net_Sales": "Net Sales", "Discount_Amount": "Discounts", "Orders": "Orders"}
+# Precomputed column suffix (see aggregates.add_rolling_columns) -> label
+ROLLING_LABELS = {"YTD": "YTD", "T3M": "Trailing 3M", "T12M": "Trailing 12M", "MoM": "MoM %"}
+
+
+# ---- Cache ----
+def figure_size(fig):
+    """Rough size in bytes of a figure: its traces' data arrays plus overhead."""
+    size = sys.getsizeof(fig)
+    for trace in fig.data:
+        for attr in ("x", "y", "text"):
+            values = getattr(trace, attr, None)
+            if values is not None:
+                size += np.asarray(values).nbytes if not isinstance(values, str) else len(values)
+        size += 2048   # trace properties and layout share
+    return size
+
+
+class FigureCache(SharedCache):
+    """Shared LRU of built figures, bounded by ``max_bytes`` of trace data."""
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET, ttl=None):
+        super().__init__(max_bytes, ttl, sizer=figure_size)
+
+
+def spec_key(kind, branches=None, period=None, version=None, **options):
+    """Cache key for a chart spec; ``branches`` may be a name or a list."""
+    if isinstance(branches, (list, tuple)):
+        branches = tuple(branches)
+    return (kind, branches, period, version, tuple(sorted(options.items())))
+
+
+# ---- Payload reduction ----
+def lttb_indices(y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` points that keep the shape of ``y``.
+
+    Points are assumed evenly spaced on x (chart categories).  The first
+    and last points are always kept, and each bucket keeps the point that
+    spans the largest triangle with its neighbours, so peaks and troughs
+    survive.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    x = np.arange(n, dtype=float)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def _needs_thinning(rows, max_points):
+    return max_points is not None and len(rows) > max_points
+
+
+def _thin(rows, col, max_points):
+    """``rows`` reduced to at most ``max_points`` rows by LTTB on ``col``."""
+    if not _needs_thinning(rows, max_points):
+        return rows
+    return rows.iloc[lttb_indices(rows[col].to_numpy(dtype=float), max_points)]
+
+
+def _values(series, compact):
+    values = series.to_numpy()
+    return values.astype(np.float32) if compact and values.dtype == np.float64 else values
+
+
+def payload_size(fig):
+    """Bytes of the figure JSON that ``st.plotly_chart`` sends to the browser."""
+    return len(fig.to_json())
+
+
+def series_label(col):
+    """Display name of a metric column or precomputed variant (e.g. ``Net_Sales_YTD``)."""
+    if col in METRIC_LABELS:
+        return METRIC_LABELS[col]
+    base, suffix = col.rsplit("_", 1)
+    return f"{METRIC_LABELS[base]} {ROLLING_LABELS[suffix]}"
+
+
+def metric_columns(rows):
+    """The metric columns ``metric_lines`` can draw for ``rows``."""
+    return list(METRIC_LABELS) + [f"{col}_{suffix}" for col in METRIC_LABELS
+                                  for suffix in ROLLING_LABELS if f"{col}_{suffix}" in rows]
+
+
+# ---- Builders ----
+def _menu_buttons(labels, titles, traces_per_metric=1, offset=0, n=None):
+    """One button per label, each showing its ``traces_per_metric`` traces only."""
+    n = n or offset + len(labels) * traces_per_metric
+    buttons = []
+    for i, (label, title) in enumerate(zip(labels, titles)):
+        first = offset + i * traces_per_metric
+        visible = [first <= j < first + traces_per_metric for j in range(n)]
+        buttons.append(dict(label=label, method="update",
+                            args=[{"visible": visible}, {"title": {"text": title}}]))
+    return buttons
+
+
+def _toggle_menu(labels, titles, traces_per_metric=1, n=None):
+    """The Net Sales / Discounts / Orders button row used by every chart."""
+    return [dict(type="buttons", direction="left", buttons=_menu_buttons(labels, titles, traces_per_metric, n=n),
+                 x=0.5, y=1.15, xanchor="center", yanchor="top")]
+
+
+PERIOD_LABELS = {"month": ("Month_Label", "Month"), "quarter": ("Quarter_Label", "Quarter"),
+                 "year": ("Year_Label", "Year")}
+
+
+def _forecast_line(rows, forecast, col, label_col, color, visible=True):
+    """Dashed continuation of ``col`` over the ``forecast`` months (joined to the last actual point)."""
+    x = list(forecast[label_col])
+    y = list(forecast[col])
+    if len(rows):
+        x.insert(0, rows[label_col].iloc[-1])
+        y.insert(0, rows[col].iloc[-1])
+    return go.Scatter(
+        x=x, y=y, mode="lines+markers", name=f"{METRIC_LABELS[col]} forecast",
+        line=dict(color=color, dash="dash") if color else dict(dash="dash"),
+        visible=visible,
+    )
+
+
+def metric_lines(rows, title_suffix="", orders_color=None, level="month", metric=None, max_points=None,
+                 forecast=None):
+    """Net Sales / Discounts / Orders lines for one branch slice, per ``level`` period.
+
+    When ``rows`` carries the precomputed rolling columns (the monthly
+    rollup does), a dropdown next to the buttons switches to any metric's
+    YTD, trailing 3/12-month or month-over-month line; those are extra
+    hidden traces, so nothing is computed on the client.
+
+    With ``metric`` (any of ``metric_columns(rows)``) only that line is
+    built, without menus, and LTTB-thinned to ``max_points`` (sent as float32
+    when it was thinned).
+
+    ``forecast`` (monthly rows with ``Month_Label`` and the metric columns)
+    adds a dashed forecast line after each base metric, shown with it.
+    """
+    label_col, period = PERIOD_LABELS[level]
+    colors = {"Net_Sales": "#2ecc71", "Discount_Amount": "red", "Orders": orders_color}
+    if metric is not None:
+        thinned = _needs_thinning(rows, max_points)
+        rows = _thin(rows, metric, max_points)
+        base = metric if metric in METRIC_LABELS else metric.rsplit("_", 1)[0]
+        fig = go.Figure(go.Scatter(
+            x=rows[label_col],
+            y=_values(rows[metric], thinned),
+            mode="lines+markers" if len(rows) <= 200 else "lines",
+            name=series_label(metric),
+            line=dict(color=colors[base]) if colors[base] else None,
+        ))
+        if forecast is not None and len(forecast) and metric in METRIC_LABELS:
+            fig.add_trace(_forecast_line(rows, forecast, metric, label_col, colors[metric]))
+        fig.update_layout(title={"text": f"{series_label(metric)} by {period}{title_suffix}"}, showlegend=False)
+        fig.update_yaxes(tickformat="d")
+        return fig
+
+    variants = [(f"{col}_{suffix}", f"{label} {name}", col)
+                for col, label in METRIC_LABELS.items()
+                for suffix, name in ROLLING_LABELS.items() if f"{col}_{suffix}" in rows]
+    lines = [(col, label, col) for col, label in METRIC_LABELS.items()] + variants
+
+    fig = go.Figure()
+    for i, (col, label, base) in enumerate(lines):
+        fig.add_trace(go.Scatter(
+            x=rows[label_col],
+            y=rows[col],
+            mode="lines+markers",
+            name=label,
+            line=dict(color=colors[base]) if colors[base] else None,
+            visible=i == 0,
+        ))
+
+    n_traces = len(lines)
+    if forecast is not None and len(forecast):
+        for i, col in enumerate(METRIC_LABELS):
+            fig.add_trace(_forecast_line(rows, forecast, col, label_col, colors[col], visible=i == 0))
+        n_traces += len(METRIC_LABELS)
+
+    titles = [f"{label} by {period}{title_suffix}" for label in METRIC_LABELS.values()]
+    menus = _toggle_menu(list(METRIC_LABELS.values()), titles, n=n_traces)
+    if n_traces > len(lines):
+        # Each metric button also shows that metric's forecast line
+        for i, button in enumerate(menus[0]["buttons"]):
+            button["args"][0]["visible"][len(lines) + i] = True
+    if variants:
+        names = [label for _, label, _ in variants]
+        menus.append(dict(
+            type="dropdown", direction="down", x=1.0, y=1.15, xanchor="right", yanchor="top",
+            showactive=False,
+            buttons=_menu_buttons(names, [f"{name} by {period}{title_suffix}" for name in names],
+                                  offset=len(METRIC_LABELS), n=n_traces),
+        ))
+    fig.update_layout(updatemenus=menus)
+    fig.update_layout(title={"text": titles[0]}, showlegend=False)
+    fig.update_yaxes(tickformat="d")   # أعداد صحيحة فقط
+    return fig
+
+
+def aov_line(table, branch, max_points=None, compact=False):
+    """Average order value per month (float32 in ``compact`` mode once thinned)."""
+    thinned = compact and _needs_thinning(table, max_points)
+    table = _thin(table, "AOV", max_points)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=table["Month_Label"],
+        y=_values(table["AOV"], thinned),
+        mode="lines+markers",
+        line=dict(color="#007BFF", width=3),
+        marker=dict(size=8),
+        name="Avg Order Value",
+    ))
+    fig.update_layout(
+        title=f"📈 Average Order Value per Month - {branch}",
+        xaxis_title="Month",
+        yaxis_title="Average Order Value (SAR)",
+        hovermode="x unified",
+        plot_bgcolor="white",
+    )
+    return fig
+
+
+def period_bars(periods, metric=None):
+    """Grouped bars comparing metric totals across periods.
+
+    ``periods`` is a list of ``(start, end, totals)`` with ``totals`` a
+    metric -> value dict.  With ``metric`` only that metric's bars are built.
+    """
+    colors = {
+        "Net_Sales": ["#27ae60", "#2ecc71", "#145a32", "#82e0aa", "#1e8449", "#abebc6"],
+        "Discount_Amount": ["darkred", "red", "#e74c3c", "#f1948a", "#922b21", "#fadbd8"],
+        "Orders": ["navy", "blue", "#5dade2", "#1a5276", "#85c1e9", "#2874a6"],
+    }
+    labels = METRIC_LABELS if metric is None else {metric: METRIC_LABELS[metric]}
+    fig = go.Figure()
+    for k, (col, label) in enumerate(labels.items()):
+        for i, (start, end, totals) in enumerate(periods):
+            fig.add_trace(go.Bar(
+                x=[f"Period {i + 1}"], y=[totals[col]],
+                name=f"{label} {start:%b %Y} - {end:%b %Y}",
+                marker_color=colors[col][i % len(colors[col])],
+                visible=None if k == 0 else False,
+                texttemplate="%{y:,.0f}", textposition="inside",
+                textfont=dict(size=20, color="white"),
+            ))
+
+    fig.update_xaxes(type="category")
+    titles = [f"{label} Comparison" for label in labels.values()]
+    ranges = " vs ".join(f"{start:%b %Y}-{end:%b %Y}" for start, end, _ in periods)
+    fig.update_layout(
+        barmode="group",
+        updatemenus=_toggle_menu(list(labels.values()), titles, len(periods)) if metric is None else [],
+        title={"text": f"Comparison: {ranges}"},
+        showlegend=True,
+    )
+    fig.update_yaxes(tickformat="d")
+    return fig
+
+
+def branch_bars(totals, start, end, metric=None):
+    """Per-branch metric totals for one period (only ``metric`` if given)."""
+    colors = {"Net_Sales": "#2ecc71", "Discount_Amount": "red", "Orders": "blue"}
+    labels = METRIC_LABELS if metric is None else {metric: METRIC_LABELS[metric]}
+    fig = go.Figure()
+    for i, (col, label) in enumerate(labels.items()):
+        fig.add_trace(go.Bar(
+            x=totals["Branch"],
+            y=totals[col].to_numpy(),
+            name=label,
+            marker_color=colors[col],
+            visible=None if i == 0 else False,
+            texttemplate="%{y:,.0f}",
+            textposition="inside",
+            textfont=dict(size=18, color="white"),
+        ))
+
+    titles = [f"{label} {start:%b %Y} → {end:%b %Y}" for label in labels.values()]
+    fig.update_layout(
+        barmode="group",
+        updatemenus=_toggle_menu(list(labels.values()), titles) if metric is None else [],
+        title={"text": titles[0]},
+        showlegend=True,
+    )
+    fig.update_yaxes(tickformat="d")
+    return fig
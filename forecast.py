@@ -0,0 +1,144 @@
+"""Batched seasonal forecasts of every branch's monthly metrics.
+
+All branches and metrics are fitted at once from the cube's dense
+``[branch, month, metric]`` values; there is no loop over models.
+
+``"seasonal_linear"``  per-branch weighted least squares of a linear trend
+                       plus month-of-year effects.  The normal equations of
+                       every branch are stacked into one ``[branch, p, p]``
+                       array and solved with a single batched
+                       ``np.linalg.solve``.  Months without rows get zero
+                       weight, so a branch that opened late is fitted on
+                       its own history only.
+``"seasonal_naive"``   the same month a year earlier, or the branch's recent
+                       average where that month has no data.
+
+Branches with no rows in the last three months are treated as closed and
+forecast at zero; forecasts are clipped at zero.  The default horizon runs
+to the end of the first full calendar quarter after the data, so
+``Forecast.next_quarter()`` covers every branch.
+"""
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from aggregates import METRICS, ordinal_to_timestamp
+
+METHODS = ("seasonal_linear", "seasonal_naive")
+SEASON = 12
+# Shrinks month-of-year effects that have little data towards zero
+SEASONAL_RIDGE = 1.0
+
+
+@dataclass(frozen=True)
+class Forecast:
+    """Forecast ``values[b, h, k]`` for ``branches`` from month ordinal ``first_month`` on."""
+    branches: List[str]
+    first_month: int
+    values: np.ndarray
+    method: str
+
+    @property
+    def horizon(self):
+        return self.values.shape[1]
+
+    @property
+    def months(self):
+        return ordinal_to_timestamp(np.arange(self.first_month, self.first_month + self.horizon))
+
+    def for_branch(self, branch, start=None, end=None):
+        """One branch's forecast months (inclusive ``start``/``end`` bounds), empty if unknown."""
+        months = self.months
+        keep = np.ones(len(months), dtype=bool)
+        if start is not None:
+            keep &= months >= pd.Timestamp(start)
+        if end is not None:
+            keep &= months <= pd.Timestamp(end)
+        if branch not in self.branches:
+            keep[:] = False
+            values = np.zeros((self.horizon, len(METRICS)))
+        else:
+            values = self.values[self.branches.index(branch)]
+        out = pd.DataFrame(values[keep], columns=METRICS)
+        out.insert(0, "Month", months[keep])
+        out.insert(1, "Month_Label", months[keep].strftime("%b %Y"))
+        out["Orders"] = out["Orders"].round().astype("int64")
+        return out
+
+    def next_quarter(self):
+        """``(label, totals)``: each branch's totals for the first full quarter forecast."""
+        ords = np.arange(self.first_month, self.first_month + self.horizon)
+        start = int(ords[np.argmax(ords % 3 == 0)])
+        window = slice(start - self.first_month, start - self.first_month + 3)
+        totals = pd.DataFrame(self.values[:, window].sum(axis=1), columns=METRICS)
+        totals.insert(0, "Branch", self.branches)
+        totals["Orders"] = totals["Orders"].round().astype("int64")
+        label = f"Q{start % 12 // 3 + 1} {start // 12}"
+        return label, totals
+
+
+def _design(ords, n_months):
+    """Intercept, scaled trend and month-of-year dummies (January is the base)."""
+    ords = np.asarray(ords)
+    X = np.zeros((len(ords), 2 + SEASON - 1))
+    X[:, 0] = 1.0
+    X[:, 1] = (ords - ords[0]) / max(n_months, 1)
+    moy = ords % SEASON
+    rows = np.flatnonzero(moy > 0)
+    X[rows, 1 + moy[rows]] = 1.0
+    return X
+
+
+def _seasonal_linear(values, observed, first_month, future):
+    n_branches, n_months, _ = values.shape
+    ords = np.arange(first_month, first_month + n_months)
+    X = _design(np.concatenate([ords, future]), n_months)
+    Xh, Xf = X[:n_months], X[n_months:]
+    W = observed.astype(float)
+
+    ridge = np.full(X.shape[1], 1e-9)
+    ridge[2:] = SEASONAL_RIDGE
+    # Stacked normal equations: one [p, p] system and [p, metric] rhs per branch
+    XtWX = np.einsum("bm,mp,mq->bpq", W, Xh, Xh) + np.diag(ridge)
+    XtWY = np.einsum("bm,mp,bmk->bpk", W, Xh, values)
+    beta = np.linalg.solve(XtWX, XtWY)
+    return np.einsum("hp,bpk->bhk", Xf, beta)
+
+
+def _seasonal_naive(values, observed, first_month, future):
+    n_months = values.shape[1]
+    # Recent average over the last three months with data, per branch
+    recent = np.zeros((values.shape[0], values.shape[2]))
+    counts = np.cumsum(observed[:, ::-1], axis=1)[:, ::-1]
+    last3 = observed & (counts <= 3)
+    n = last3.sum(axis=1)
+    np.divide((values * last3[:, :, None]).sum(axis=1), n[:, None], out=recent, where=n[:, None] > 0)
+
+    src = future - SEASON - first_month
+    valid = src >= 0
+    src = np.clip(src, 0, n_months - 1)
+    prior = values[:, src]
+    has_prior = valid[None, :] & observed[:, src]
+    return np.where(has_prior[:, :, None], prior, recent[:, None, :])
+
+
+def fit(cube, method="seasonal_linear", horizon=None):
+    """Forecast every branch in ``cube`` ``horizon`` months past its last month."""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, not {method!r}")
+    values = np.diff(cube.cum, axis=1)
+    observed = np.diff(cube.count_cum, axis=1) > 0
+    last = cube.first_month + cube.n_months - 1
+    if horizon is None:
+        # Through the end of the first full quarter after the data
+        horizon = (last - last % 3 + 5) - last
+    future = np.arange(last + 1, last + 1 + horizon)
+    if not cube.branches:
+        return Forecast([], int(last + 1), np.zeros((0, horizon, len(METRICS))), method)
+
+    model = _seasonal_linear if method == "seasonal_linear" else _seasonal_naive
+    pred = np.clip(model(values, observed, cube.first_month, future), 0, None)
+    pred[~observed[:, -3:].any(axis=1)] = 0.0
+    return Forecast(list(cube.branches), int(last + 1), pred, method)
@@ -0,0 +1,431 @@
+"""Incremental ingestion of monthly drop files.
+
+New months arrive as small CSVs (e.g. ``drops/sales_2025-11.csv``) in the
+same ``Branch,Month,Discount_Amount,Net_Sales,Orders`` schema as the main
+extract.  ``SalesDataset`` validates each new drop, merges it into the
+stored data and updates the cube for the touched months only, so history
+is never re-parsed.
+
+A merge splices the drop rows into the sorted history without sorting
+it again, computes derived columns for the drop rows only, rolls up only
+the touched branch-months and recomputes the rolling columns from each
+branch's first touched month.  What stays O(history) is copying the
+columns once into the new frame and rewriting the store file
+(``save_store``); both are sequential and take a fraction of a second
+for a few million rows.
+
+A drop whose rows are all dated on the 1st is monthly: one row per
+``(Branch, Month)``, each replacing whatever the store holds for that
+branch in that month.  Any other drop holds daily or order-level rows
+(``Month`` is the row's date, several rows per branch and day are fine);
+they are appended as they are, and the per-branch charts read the
+monthly, quarterly or yearly rollups kept by the dataset.  Appended rows
+cannot be told apart from the rest later, so a daily drop that changes
+after it was ingested is rejected; new rows go in a new file.
+"""
+import dataclasses
+import glob
+import os
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import shards
+from aggregates import (
+    METRICS, ROLLING, SalesCube, add_rolling_columns, is_monthly, rollup, update_rolling_columns,
+)
+from data_store import (
+    CACHE_DIR, COLUMNS, BranchIndex, add_derived_columns, content_hash,
+    data_version, file_stat, load_store, read_meta, save_store,
+)
+
+DROP_DIR = "drops"
+DROP_PATTERN = "sales_*.csv"
+
+
+# ---- Validation ----
+def read_drop(path):
+    """Read and validate one drop file; raise ``ValueError`` listing every problem."""
+    raw = pd.read_csv(path, dtype={"Branch": str, "Month": str})
+    problems = []
+
+    missing = [c for c in COLUMNS if c not in raw.columns]
+    extra = [c for c in raw.columns if c not in COLUMNS]
+    if missing:
+        problems.append(f"missing columns {missing}")
+    if extra:
+        problems.append(f"unexpected columns {extra}")
+    if problems:
+        raise ValueError(f"{path}: " + "; ".join(problems))
+
+    out = pd.DataFrame({
+        "Branch": raw["Branch"].str.strip(),
+        "Month": pd.to_datetime(raw["Month"], format="ISO8601", errors="coerce"),
+    })
+    for col in ["Discount_Amount", "Net_Sales", "Orders"]:
+        out[col] = pd.to_numeric(raw[col], errors="coerce")
+
+    if out["Branch"].isna().any() or (out["Branch"] == "").any():
+        problems.append("empty Branch values")
+    if out["Month"].isna().any():
+        bad = raw.loc[out["Month"].isna(), "Month"].head(3).tolist()
+        problems.append(f"unparseable Month values {bad}")
+    for col in ["Discount_Amount", "Net_Sales", "Orders"]:
+        if out[col].isna().any():
+            problems.append(f"non-numeric {col} values")
+    if (out["Orders"] < 0).any() or (out["Orders"].dropna() % 1 != 0).any():
+        problems.append("Orders must be non-negative integers")
+    if is_monthly_drop(out) and out.duplicated(["Branch", "Month"]).any():
+        problems.append("duplicate (Branch, Month) rows")
+    if problems:
+        raise ValueError(f"{path}: " + "; ".join(problems))
+
+    out["Orders"] = out["Orders"].astype("int32")
+    out["Branch"] = out["Branch"].astype("category")
+    return out
+
+
+def is_monthly_drop(drop):
+    """True if every row of ``drop`` is dated on the 1st of its month."""
+    return bool((drop["Month"].dt.day == 1).all())
+
+
+def pending_drops(drop_dir, ingested):
+    """Drop files that are new or changed since they were ingested.
+
+    Unchanged files are recognised by size and mtime alone, so this is
+    cheap enough to call on every rerun.
+    """
+    pending = []
+    for path in sorted(glob.glob(os.path.join(drop_dir, DROP_PATTERN))):
+        name = os.path.basename(path)
+        seen = ingested.get(name)
+        stat = file_stat(path)
+        if seen is not None and seen["size"] == stat["size"] and seen["mtime_ns"] == stat["mtime_ns"]:
+            continue
+        digest = content_hash(path)
+        if seen is not None and seen["hash"] == digest:
+            continue
+        pending.append((path, {**stat, "hash": digest}))
+    return pending
+
+
+# ---- Merge ----
+def month_start(month):
+    """``month`` (a datetime Series) moved to the 1st of each month, as an array."""
+    return month.to_numpy().astype("datetime64[M]").astype("datetime64[ns]")
+
+
+def month_keys(*frames):
+    """The distinct ``(Branch, month start)`` pairs of the rows in ``frames``."""
+    return pd.MultiIndex.from_arrays([
+        np.concatenate([f["Branch"].astype(str).to_numpy() for f in frames]),
+        np.concatenate([month_start(f["Month"]) for f in frames]),
+    ]).unique()
+
+
+def _month_ms(month):
+    return month.to_numpy().astype("datetime64[ms]").view(np.int64)
+
+
+def touching(frame, keys):
+    """Mask of the rows of ``frame`` whose ``(Branch, month start)`` is in ``keys``.
+
+    ``frame`` is sorted by ``(Branch, Month)``, so each pair is one run of
+    rows, located with ``searchsorted`` on a single int64 sort key.
+    """
+    mask = np.zeros(len(frame) + 1, dtype=np.int64)
+    codes = frame["Branch"].cat.categories.get_indexer(keys.get_level_values(0))
+    found = codes >= 0
+    if not len(frame) or not found.any():
+        return mask[:-1].astype(bool)
+    starts = keys.get_level_values(1).to_numpy()[found].astype("datetime64[M]")
+    lo_ms = starts.astype("datetime64[ms]").view(np.int64)
+    hi_ms = (starts + 1).astype("datetime64[ms]").view(np.int64)
+
+    ms = _month_ms(frame["Month"])
+    first = min(ms.min(), lo_ms.min())
+    span = max(ms.max(), hi_ms.max()) - first + 1
+    row_keys = frame["Branch"].cat.codes.to_numpy().astype(np.int64) * span + (ms - first)
+    codes = codes[found].astype(np.int64) * span
+    # The runs are disjoint: +1 where one starts, -1 where it ends
+    np.add.at(mask, np.searchsorted(row_keys, codes + (lo_ms - first)), 1)
+    np.add.at(mask, np.searchsorted(row_keys, codes + (hi_ms - first)), -1)
+    return np.cumsum(mask[:-1]) > 0
+
+
+def _recode(column, categories):
+    """Codes of the categorical ``column`` under ``categories`` (a superset of its own)."""
+    return categories.get_indexer(column.cat.categories)[column.cat.codes.to_numpy()]
+
+
+def splice_rows(frame, rows, drop=None):
+    """``frame`` without the rows masked by ``drop`` and with ``rows`` inserted.
+
+    Both frames are sorted by ``(Branch, Month)`` and ``rows`` go after
+    existing rows with the same key, where a stable sort would put them.
+    Nothing is re-sorted: the insert positions come from one
+    ``searchsorted`` and each column is copied once.  Columns that
+    ``rows`` lacks are NaN on the inserted rows.
+    """
+    kept = frame if drop is None or not drop.any() else frame[~drop]
+    branches = kept["Branch"].cat.categories.union(rows["Branch"].cat.categories)
+    kept_codes, row_codes = _recode(kept["Branch"], branches), _recode(rows["Branch"], branches)
+    kept_ms, row_ms = _month_ms(kept["Month"]), _month_ms(rows["Month"])
+    order = np.lexsort((row_ms, row_codes))
+    rows, row_codes, row_ms = rows.iloc[order], row_codes[order], row_ms[order]
+
+    # One int64 per row that sorts like (Branch, Month)
+    all_ms = np.concatenate([kept_ms, row_ms])
+    first = all_ms.min() if len(all_ms) else 0
+    span = all_ms.max() - first + 1 if len(all_ms) else 1
+    at = np.searchsorted(kept_codes * span + (kept_ms - first), row_codes * span + (row_ms - first),
+                         side="right")
+
+    out = {}
+    for col in kept.columns:
+        if col == "Branch":
+            out[col] = pd.Categorical.from_codes(np.insert(kept_codes, at, row_codes), categories=branches)
+        elif col == "Month_Label":
+            labels = kept[col].cat.categories.append(rows[col].cat.categories).unique()
+            labels = labels[np.argsort(pd.to_datetime(labels, format="%b %Y"))]
+            codes = np.insert(_recode(kept[col], labels), at, _recode(rows[col], labels))
+            out[col] = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+        else:
+            values = rows[col].to_numpy() if col in rows else np.nan
+            out[col] = np.insert(kept[col].to_numpy(), at, values)
+    return pd.DataFrame(out)
+
+
+def merge_rows(df, new, appended=None):
+    """Merge validated drop rows into ``df``.
+
+    ``new`` holds monthly rows: each replaces every row of its branch in
+    its month, whatever the granularity of those rows.  ``appended``
+    holds daily or order-level rows, added as they are.  Returns
+    ``(merged, replaced)`` where ``replaced`` holds the old rows that
+    ``new`` overrides.  ``merged`` is sorted by ``(Branch, Month)`` and
+    carries the derived columns.
+
+    Only the drop rows get their derived columns computed; they are
+    spliced into the history with ``splice_rows`` rather than re-sorting
+    it.  Other columns of ``df`` (the rolling columns when ``df`` is its
+    own monthly rollup) are NaN on them until ``DataSnapshot.with_rows``
+    fills them in.
+    """
+    drop = touching(df, month_keys(new))
+    replaced = df.loc[drop, COLUMNS]
+    parts = [new[COLUMNS]] + ([appended[COLUMNS]] if appended is not None else [])
+    branch = union_categoricals([p["Branch"] for p in parts])
+    rows = pd.concat(parts, ignore_index=True)
+    rows["Branch"] = pd.Categorical(branch)
+    return splice_rows(df, add_derived_columns(rows), drop), replaced
+
+
+# ---- Live dataset ----
+@dataclass(frozen=True, eq=False)
+class DataSnapshot:
+    """One version of the data: the frame and everything derived from it.
+
+    ``monthly`` is ``df`` rolled up to one row per branch per month (the
+    same object when the data is already monthly) with the YTD, trailing
+    and month-over-month columns, and ``index`` is built over it.  Quarter
+    and year rollups are materialized on first use; the rest is built in
+    full by ``build`` before the snapshot is published.
+    """
+    df: pd.DataFrame
+    meta: dict
+    cube: SalesCube
+    monthly: pd.DataFrame
+    index: BranchIndex
+    _levels: dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, df, meta, cube=None):
+        if cube is None:
+            cube = SalesCube.from_frame(df)
+        monthly = add_rolling_columns(rollup(df, "month"))
+        index = BranchIndex(monthly)
+        return cls(df, meta, cube, monthly, index, {"month": index})
+
+    def with_rows(self, df, meta, cube, keys):
+        """The snapshot after a merge.
+
+        ``df`` comes from ``merge_rows`` and ``keys`` holds the
+        ``(Branch, month start)`` pairs it changed (``month_keys``).  Only
+        those months are rolled up again and spliced into ``monthly``, and
+        the rolling columns are recomputed from each branch's first changed
+        month.  When the data is monthly, ``monthly`` is ``df`` itself and
+        only its rolling columns need updating.
+        """
+        if self.monthly is self.df:
+            if not is_monthly(df):
+                # Daily rows in monthly data: the frame is no longer its own rollup
+                rolling = [f"{col}_{suffix}" for col in METRICS for suffix in ROLLING]
+                return DataSnapshot.build(df.drop(columns=rolling), meta, cube)
+            monthly = df
+        else:
+            fresh = rollup(df[touching(df, keys)], "month")
+            monthly = splice_rows(self.monthly, fresh, touching(self.monthly, keys))
+        months = keys.get_level_values(1)
+        since = pd.Series(months.year * 12 + months.month - 1).groupby(keys.get_level_values(0)).min()
+        index = BranchIndex(update_rolling_columns(monthly, since))
+        return DataSnapshot(df, meta, cube, monthly, index, {"month": index})
+
+    @property
+    def version(self):
+        return self.df.attrs["data_version"]
+
+    def level_index(self, level):
+        """Branch index over the ``"month"``, ``"quarter"`` or ``"year"`` rollup."""
+        index = self._levels.get(level)
+        if index is None:
+            # Two sessions may build the same rollup at once; either result is the same
+            index = self._levels[level] = BranchIndex(rollup(self.monthly, level))
+        return index
+
+
+class SalesDataset:
+    """The current ``DataSnapshot`` of the extract, kept current with drops.
+
+    One instance is shared by every session.  ``refresh()`` builds a new
+    snapshot in full (``DataSnapshot.with_rows`` after drops) and publishes it with a single assignment under the
+    lock; nothing in a published snapshot is mutated.  Read ``snapshot``
+    once per run and use that object throughout, so every number on a
+    page comes from the same version even if another session refreshes
+    meanwhile.  ``df``, ``cube``, ``index`` etc. are shortcuts to the
+    current snapshot.
+
+    ``csv_path`` may also be a directory or glob of shard files, loaded
+    with ``shards.load_shards`` (``workers`` and ``conflict`` go there).
+
+    ``refresh()`` also notices when the source itself is replaced: the
+    size and mtime of each source file are compared with those seen at
+    load time (a stat per file, no reads).  On a change the store is
+    brought up to date, where the content hash decides whether the data
+    really changed; only then is a new frame (and ``version``) swapped in.
+    """
+
+    def __init__(self, csv_path, drop_dir=DROP_DIR, cache_dir=CACHE_DIR, stream=None, progress=None,
+                 workers=None, conflict="last"):
+        self.csv_path = csv_path
+        self.drop_dir = drop_dir
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        # Drops that failed validation: name -> (file info, error message)
+        self.rejected = {}
+        self._sharded = shards.is_sharded(csv_path)
+        self._load_args = (workers, conflict) if self._sharded else (stream, progress)
+        # The merged store of shards is saved under a name derived from the source
+        self._store_path = shards.store_key(csv_path) if self._sharded else csv_path
+
+        self._source = self.source_stat()
+        self.snapshot = DataSnapshot.build(*self._load())
+        self.refresh()
+
+    @property
+    def df(self):
+        return self.snapshot.df
+
+    @property
+    def meta(self):
+        return self.snapshot.meta
+
+    @property
+    def cube(self):
+        return self.snapshot.cube
+
+    @property
+    def monthly(self):
+        return self.snapshot.monthly
+
+    @property
+    def index(self):
+        return self.snapshot.index
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    def level_index(self, level):
+        return self.snapshot.level_index(level)
+
+    @property
+    def store_file(self):
+        """The Feather store ``df`` was read from (rewritten when drops are merged)."""
+        return read_meta(self._store_path, self.cache_dir)[0]
+
+    def source_stat(self):
+        """Size and mtime of each source file (the CSV, or every shard)."""
+        paths = shards.shard_paths(self.csv_path) if self._sharded else [self.csv_path]
+        return {path: file_stat(path) for path in paths}
+
+    def _load(self):
+        if self._sharded:
+            return shards.load_shards(self.csv_path, self.cache_dir, *self._load_args)
+        return load_store(self.csv_path, self.cache_dir, *self._load_args)
+
+    def _reload_if_changed(self):
+        """Reload from the source if it changed on disk; True if the data did."""
+        try:
+            stat = self.source_stat()
+        except (OSError, ValueError):
+            # Mid-replace (or a broken shard set): keep serving what is loaded
+            return False
+        if stat == self._source:
+            return False
+        df, meta = self._load()
+        self._source = stat
+        if data_version(meta) == self.version:
+            # Touched or copied without a content change
+            self.snapshot = dataclasses.replace(self.snapshot, meta=meta)
+            return False
+        self.snapshot = DataSnapshot.build(df, meta)
+        return True
+
+    def refresh(self):
+        """Reload a changed source, append any new drop files; return the drop names ingested."""
+        with self._lock:
+            self._reload_if_changed()
+        if not os.path.isdir(self.drop_dir):
+            return []
+        with self._lock:
+            current = self.snapshot
+            drops = dict(current.meta.get("drops", {}))
+            seen = {**drops, **{name: info for name, (info, _) in self.rejected.items()}}
+            frames, accepted = [], []
+            for path, info in pending_drops(self.drop_dir, seen):
+                name = os.path.basename(path)
+                try:
+                    drop = read_drop(path)
+                    info = {**info, "monthly": is_monthly_drop(drop)}
+                    if name in drops and not (info["monthly"] and drops[name].get("monthly", True)):
+                        raise ValueError(f"{path}: changed after it was ingested; daily and order-level "
+                                         "drops are only appended, so put new rows in a new file")
+                except ValueError as exc:
+                    self.rejected[name] = (info, str(exc))
+                    continue
+                self.rejected.pop(name, None)
+                frames.append(drop.assign(monthly=info["monthly"]))
+                accepted.append((name, info))
+            if not frames:
+                return []
+
+            branch = union_categoricals([f["Branch"] for f in frames])
+            rows = pd.concat(frames, ignore_index=True)
+            rows["Branch"] = pd.Categorical(branch)
+            new, appended = rows[rows["monthly"]], rows[~rows["monthly"]]
+            # A later file wins when two monthly drops cover the same (Branch, Month)
+            new = new.drop_duplicates(["Branch", "Month"], keep="last")
+
+            merged, replaced = merge_rows(current.df, new, appended)
+            drops.update(accepted)
+            meta = save_store(self._store_path, merged, drops, self.cache_dir)
+            merged.attrs["data_version"] = data_version(meta)
+
+            cube = current.cube.with_rows(pd.concat([new, appended]), replaced)
+            self.snapshot = current.with_rows(merged, meta, cube, month_keys(new, appended))
+            return [name for name, _ in accepted]
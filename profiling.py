@@ -0,0 +1,211 @@
+"""Opt-in timing of dashboard sections.
+
+Enabled with ``?profile=1`` or ``SALES_PROFILE=1``.  Each rerun (the full
+script or one tab fragment) is a *run*; inside it, ``section(name)`` records
+wall time and the change in process RSS.  A run's sections are shown in a
+collapsible table and, when ``SALES_PROFILE_TRACE`` names a file, appended
+to it as one JSON line.
+
+Counting pandas calls means wrapping pandas functions for the whole
+process, so it is left to the server operator: only ``SALES_PROFILE=1``
+turns it on, never a visitor's ``?profile=1``.
+
+    profiler = Profiler.from_settings(st.query_params)
+    profiler.start_run("script")
+    with profiler.section("load"):
+        ...
+    profiler.end_run(render=show_table)
+
+When disabled every call is a no-op and pandas is left unpatched, so the
+instrumentation can stay in place.  Sessions share one process: RSS deltas include whatever other
+sessions allocated meanwhile, and are a hint rather than an attribution.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+# pandas entry points whose calls are counted inside a section
+_PANDAS_OPS = {
+    pd.DataFrame: ["__getitem__", "groupby", "sort_values", "merge", "assign", "copy", "apply", "pivot_table"],
+    pd.Series: ["groupby", "sort_values", "isin", "apply"],
+}
+_PANDAS_FUNCS = ["concat", "to_datetime", "read_csv"]
+
+_local = threading.local()
+_patch_lock = threading.Lock()
+_patched = False
+
+
+def _counters():
+    return getattr(_local, "counters", None)
+
+
+def _counting(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        counters = _counters()
+        if counters:
+            for c in counters:
+                c[name] = c.get(name, 0) + 1
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def _patch_pandas():
+    """Wrap the counted pandas calls once per process; counting is per thread."""
+    global _patched
+    with _patch_lock:
+        if _patched:
+            return
+        for cls, names in _PANDAS_OPS.items():
+            for name in names:
+                setattr(cls, name, _counting(f"{cls.__name__}.{name}", getattr(cls, name)))
+        for name in _PANDAS_FUNCS:
+            setattr(pd, name, _counting(f"pd.{name}", getattr(pd, name)))
+        _patched = True
+
+
+def rss_bytes():
+    """Resident set size of this process, or ``None`` where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Profiler:
+    """Collects section timings per run; does nothing unless ``enabled``."""
+
+    def __init__(self, enabled=False, trace_path=None, session=None, count_pandas=False):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.session = session or uuid.uuid4().hex[:8]
+        self.count_pandas = enabled and count_pandas
+        self._runs = threading.local()
+        if self.count_pandas:
+            _patch_pandas()
+
+    @classmethod
+    def from_settings(cls, query_params=None, environ=os.environ, session=None):
+        """Enabled by ``?profile=1`` or ``SALES_PROFILE=1``; pandas counts by the latter only."""
+        query_params = query_params or {}
+        operator = environ.get("SALES_PROFILE", "0") == "1"
+        enabled = query_params.get("profile", "1" if operator else "0") == "1"
+        return cls(enabled, environ.get("SALES_PROFILE_TRACE") or None, session, count_pandas=operator)
+
+    # ---- Recording ----
+    def _stack(self):
+        stack = getattr(self._runs, "stack", None)
+        if stack is None:
+            stack = self._runs.stack = []
+        return stack
+
+    def start_run(self, name):
+        """Open a run on this thread; pair with ``end_run``."""
+        if not self.enabled:
+            return None
+        record = {"run": name, "session": self.session, "started": time.time(), "sections": []}
+        self._stack().append(record)
+        record["_total"] = contextlib.ExitStack()
+        record["_total"].enter_context(self.section("total"))
+        return record
+
+    def end_run(self, render=None):
+        """Close the innermost run; its sections go to ``render(rows)`` and the trace file."""
+        if not self.enabled or not self._stack():
+            return
+        record = self._stack()[-1]
+        record.pop("_total").close()
+        self._stack().pop()
+        if render is not None:
+            render(record["sections"])
+        self._write(record)
+
+    @contextlib.contextmanager
+    def run(self, name, render=None):
+        self.start_run(name)
+        try:
+            yield
+        finally:
+            self.end_run(render)
+
+    def profiled(self, name, render=None):
+        """Decorator running each call as a run; ``name`` is formatted with the call's args."""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.run(name.format(*args, **kwargs), render):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    @contextlib.contextmanager
+    def section(self, name):
+        """Time a block (and count pandas calls in it, with ``count_pandas``) within the current run."""
+        stack = self._stack() if self.enabled else None
+        if not stack:
+            yield
+            return
+        record = stack[-1]
+        counts = {}
+        counters = _counters()
+        if counters is None:
+            counters = _local.counters = []
+        counters.append(counts)
+        depth = sum(1 for s in record["sections"] if s.get("_open"))
+        row = {"section": name, "depth": depth, "_open": True}
+        record["sections"].append(row)
+        rss0, t0 = rss_bytes(), time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            rss1 = rss_bytes()
+            # by identity: open sections' (dict) counters may compare equal
+            del counters[next(i for i, c in enumerate(counters) if c is counts)]
+            row.pop("_open")
+            row.update({
+                "ms": round(elapsed * 1e3, 3),
+                "rss_delta_kb": None if rss0 is None or rss1 is None else (rss1 - rss0) // 1024,
+                "pandas_ops": sum(counts.values()) if self.count_pandas else None,
+                "ops": counts if self.count_pandas else None,
+            })
+
+    def timed(self, name, fn):
+        """``fn`` wrapped so each call is a section (e.g. a figure build on a cache miss)."""
+        if not self.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.section(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    # ---- Output ----
+    def _write(self, record):
+        if not self.trace_path:
+            return
+        line = json.dumps(record, default=str)
+        with _patch_lock, open(self.trace_path, "a") as f:
+            f.write(line + "\n")
+
+    @staticmethod
+    def table(sections):
+        """Sections as a display frame, nested names indented by depth."""
+        return pd.DataFrame([{
+            "Section": " " * s["depth"] + s["section"],
+            "ms": s["ms"],
+            "RSS Δ (KB)": s["rss_delta_kb"],
+            "pandas ops": s["pandas_ops"],
+        } for s in sections])
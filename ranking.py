@@ -0,0 +1,55 @@
+"""Partial-sort ranking and paging for branch tables.
+
+``top_n_indices`` picks the best (or worst) ``n`` rows with
+``np.argpartition`` and sorts only those, O(rows + n log n) instead of a
+full sort.  ``page`` slices one page of a table so only that page is sent
+to the browser.  Tables stay numeric; the dashboard formats them with
+column configs in the browser, so sorting by a column header stays
+numeric too.
+"""
+import math
+
+import numpy as np
+
+# Leaderboard metric -> label
+RANK_METRICS = {
+    "Net_Sales": "Net Sales",
+    "Discount_Rate": "Discount Rate",
+    "AOV": "Average Order Value",
+    "YoY %": "YoY Growth",
+}
+
+
+def top_n_indices(values, n, largest=True):
+    """Positions of the ``n`` largest (or smallest) values, best first.
+
+    NaN values (e.g. growth from a zero base) are never ranked.  Ties keep
+    their original order.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    keys = -values[valid] if largest else values[valid]
+    n = min(max(n, 0), len(valid))
+    if n == 0:
+        return valid[:0]
+    if n < len(valid):
+        # Every value tied with the n-th one, so the cut below keeps the earliest
+        cutoff = keys[np.argpartition(keys, n - 1)[n - 1]]
+        part = np.flatnonzero(keys <= cutoff)
+    else:
+        part = np.arange(len(valid))
+    # Stable order among the selected: by key, then original position
+    order = np.lexsort((valid[part], keys[part]))[:n]
+    return valid[part[order]]
+
+
+# ---- Paging ----
+def page_count(n_rows, page_size):
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page(frame, number, page_size):
+    """Rows of 1-based page ``number`` (clamped to the last page)."""
+    number = min(max(number, 1), page_count(len(frame), page_size))
+    start = (number - 1) * page_size
+    return frame.iloc[start:start + page_size]
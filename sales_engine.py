@@ -0,0 +1,331 @@
+"""Headless analytics engine behind the dashboard.
+
+Every number the tabs show comes from here: KPI totals, year-over-year
+growth, branch contribution, period comparisons and per-branch series.
+The engine only reads precomputed state (the ``SalesCube`` and the
+``BranchIndex`` over the month, quarter or year rollup), never the raw
+rows, and has no Streamlit dependency, so it can be cached, profiled and
+reused on its own.
+
+    engine = SalesEngine.from_dataset(dataset)
+    engine.kpis(SalesFilter.for_year(2025, "AirPort")).net_sales
+
+Given a ``SharedCache`` and the data version, the engine memoizes its
+query results there, so every session asking the same question shares one
+computation.
+"""
+import functools
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aggregates import METRICS, SalesCube, month_ordinal, ordinal_to_timestamp, rollup
+from data_store import BranchIndex
+from forecast import fit as fit_forecast
+from metrics import safe_divide, with_ratios
+from ranking import top_n_indices
+
+
+# ---- Result objects ----
+@dataclass(frozen=True)
+class SalesFilter:
+    """Which rows to total: a branch set and an inclusive month range.
+
+    ``branches=None`` means all branches; ``start``/``end`` of ``None``
+    leave that side of the range open.
+    """
+    branches: Optional[Tuple[str, ...]] = None
+    start: Optional[pd.Timestamp] = None
+    end: Optional[pd.Timestamp] = None
+
+    def __post_init__(self):
+        branches = self.branches
+        if isinstance(branches, str):
+            branches = (branches,)
+        elif branches is not None:
+            branches = tuple(branches)
+        object.__setattr__(self, "branches", branches)
+        for name in ("start", "end"):
+            value = getattr(self, name)
+            if value is not None:
+                object.__setattr__(self, name, pd.Timestamp(value))
+
+    @classmethod
+    def for_year(cls, year, branches=None):
+        return cls(branches, pd.Timestamp(f"{year}-01-01"), pd.Timestamp(f"{year}-12-01"))
+
+
+@dataclass(frozen=True)
+class Totals:
+    net_sales: float
+    discount: float
+    orders: int
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["Net_Sales"], d["Discount_Amount"], int(round(d["Orders"])))
+
+    def as_dict(self):
+        return {"Net_Sales": self.net_sales, "Discount_Amount": self.discount, "Orders": self.orders}
+
+    @property
+    def aov(self):
+        return float(safe_divide(self.net_sales, self.orders))
+
+
+@dataclass(frozen=True)
+class Growth:
+    """Percent change per metric; ``None`` where the base value is zero."""
+    net_sales: Optional[float]
+    discount: Optional[float]
+    orders: Optional[float]
+
+
+@dataclass(frozen=True)
+class YoYGrowth:
+    year_from: int
+    year_to: int
+    before: Totals
+    after: Totals
+    growth: Growth
+
+
+@dataclass(frozen=True)
+class MonthRange:
+    """A half-open range of month ordinals ``[start, stop)``.
+
+    ``MonthRange.between("2024-01-01", "2024-06-30")`` covers January to
+    June; the end month is included whatever its day, so month-end dates
+    need no special handling.
+    """
+    start: int
+    stop: int
+
+    def __post_init__(self):
+        if self.start >= self.stop:
+            raise ValueError(f"period start ({self.first:%b %Y}) must come before its end")
+
+    @classmethod
+    def between(cls, start, end):
+        """The months from ``start``'s month through ``end``'s month."""
+        return cls(month_ordinal(pd.Timestamp(start)), month_ordinal(pd.Timestamp(end)) + 1)
+
+    @property
+    def first(self):
+        return ordinal_to_timestamp([self.start])[0]
+
+    @property
+    def last(self):
+        """First day of the last month in the range."""
+        return ordinal_to_timestamp([self.stop - 1])[0]
+
+
+@dataclass(frozen=True)
+class PeriodTotals:
+    start: pd.Timestamp
+    end: pd.Timestamp
+    totals: Totals
+
+
+def pct_change(before, after):
+    """Percent change from ``before`` to ``after``; ``None`` when ``before`` is 0."""
+    if before == 0:
+        return None
+    return (after - before) / before * 100
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def shared(method):
+    """Serve ``method``'s results from the engine's ``SharedCache`` when it has one.
+
+    The key is the method name, the data version and the arguments (lists
+    become tuples), so results never outlive the data they came from.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None:
+            return method(self, *args, **kwargs)
+        key = ("engine", name, self.version, _hashable(args), _hashable(sorted(kwargs.items())))
+        return self.cache.get(key, lambda: method(self, *args, **kwargs))
+    return wrapper
+
+
+# ---- Engine ----
+class SalesEngine:
+    """Read-only queries over a cube and branch index.
+
+    Results may come from a cache shared with other sessions: treat the
+    returned frames as read-only.
+    """
+
+    def __init__(self, cube, index, level_index=None, cache=None, version=None):
+        self.cube = cube
+        self.index = index
+        self._level_index = level_index
+        self._levels = {"month": index}
+        self.cache = cache
+        self.version = version
+
+    @classmethod
+    def from_dataset(cls, dataset, cache=None):
+        """Engine over a ``DataSnapshot``, or a ``SalesDataset``'s current one.
+
+        The engine keeps that snapshot: later refreshes of the dataset
+        publish new snapshots and leave this engine's view unchanged.
+        """
+        data = getattr(dataset, "snapshot", dataset)
+        return cls(data.cube, data.index, data.level_index, cache, data.version)
+
+    @property
+    def branches(self):
+        return self.index.branches
+
+    @property
+    def years(self):
+        return self.cube.years
+
+    def level_index(self, level):
+        """Branch index over the ``"month"``, ``"quarter"`` or ``"year"`` rollup."""
+        if level not in self._levels:
+            if self._level_index is not None:
+                self._levels[level] = self._level_index(level)
+            else:
+                self._levels[level] = BranchIndex(rollup(self.index.df, level))
+        return self._levels[level]
+
+    @shared
+    def kpis(self, filter=None):
+        """Metric totals for ``filter`` (all data when omitted)."""
+        filter = filter or SalesFilter()
+        return Totals.from_dict(self.cube.period_totals(filter.start, filter.end, filter.branches))
+
+    @shared
+    def year_kpis(self, year, branches=None):
+        """Metric totals for one year (zeros for a year without data)."""
+        return Totals.from_dict(self.cube.year_totals(year, branches))
+
+    def _year_pair(self, year_from=None, year_to=None):
+        """``(year_from, year_to)`` with the last two years filled in by default."""
+        years = self.years
+        if year_to is None:
+            year_to = years[-1]
+        if year_from is None:
+            year_from = years[-2] if len(years) > 1 else year_to - 1
+        return year_from, year_to
+
+    @shared
+    def yoy_growth(self, branches=None, year_from=None, year_to=None):
+        """Growth from ``year_from`` to ``year_to`` (the last two years by default)."""
+        year_from, year_to = self._year_pair(year_from, year_to)
+        before = self.year_kpis(year_from, branches)
+        after = self.year_kpis(year_to, branches)
+        growth = Growth(
+            pct_change(before.net_sales, after.net_sales),
+            pct_change(before.discount, after.discount),
+            pct_change(before.orders, after.orders),
+        )
+        return YoYGrowth(year_from, year_to, before, after, growth)
+
+    @shared
+    def contribution(self, start=None, end=None):
+        """Each branch's Net_Sales and its share of the total, largest first."""
+        table = self.cube.branch_totals(start, end)[["Branch", "Net_Sales"]]
+        total = table["Net_Sales"].sum()
+        table["Contribution %"] = (table["Net_Sales"] / total * 100).round(2)
+        return table.sort_values("Net_Sales", ascending=False).reset_index(drop=True)
+
+    @shared
+    def branch_metrics(self, year_from=None, year_to=None):
+        """One row per branch with data: totals, ratios, contribution and YoY growth.
+
+        ``YoY %`` is the Net_Sales growth from ``year_from`` to ``year_to``
+        (the last two years by default); NaN where the branch had no sales
+        in ``year_from``.
+        """
+        year_from, year_to = self._year_pair(year_from, year_to)
+        table = with_ratios(self.branch_totals())
+        table["Contribution %"] = table["Net_Sales"] / table["Net_Sales"].sum() * 100
+
+        def year_sales(year):
+            totals = self.branch_totals(None, f"{year}-01-01", f"{year}-12-31")
+            return totals.set_index("Branch")["Net_Sales"].reindex(table["Branch"]).fillna(0).to_numpy()
+
+        before, after = year_sales(year_from), year_sales(year_to)
+        growth = np.full(len(table), np.nan)
+        np.divide((after - before) * 100, before, out=growth, where=before != 0)
+        table["YoY %"] = growth
+        return table
+
+    @shared
+    def leaderboard(self, metric="Net_Sales", n=10, bottom=False):
+        """The ``n`` best branches by a ``branch_metrics`` column (the worst with ``bottom``).
+
+        Uses a partial selection over the per-branch table rather than a
+        full sort; branches without a value (NaN growth) are left out.
+        """
+        table = self.branch_metrics()
+        rows = table.iloc[top_n_indices(table[metric].to_numpy(), n, largest=not bottom)]
+        rows = rows.reset_index(drop=True)
+        rows.insert(0, "Rank", np.arange(1, len(rows) + 1))
+        return rows
+
+    @shared
+    def period_compare(self, branches, *periods):
+        """Totals of ``branches`` for each period, in one pass over the cube.
+
+        Periods are ``MonthRange`` objects or inclusive ``(start, end)``
+        date pairs; ``ValueError`` if a period ends before it starts.
+        """
+        ranges = [p if isinstance(p, MonthRange) else MonthRange.between(*p) for p in periods]
+        if isinstance(branches, list):
+            branches = tuple(branches)
+        totals = self.cube.range_totals([(r.start, r.stop) for r in ranges], branches)
+        return [
+            PeriodTotals(r.first, r.last, Totals.from_dict(dict(zip(METRICS, row))))
+            for r, row in zip(ranges, totals.tolist())
+        ]
+
+    @shared
+    def branch_totals(self, branches=None, start=None, end=None):
+        """Per-branch metric totals over a period (branches with data only)."""
+        return self.cube.branch_totals(start, end, branches)
+
+    def branch_series(self, branch, start=None, end=None, level="month"):
+        """One branch's rows at ``level`` (a slice of the rollup, not a copy).
+
+        Quarter and year rows are dated at the period start, so ``start``
+        and ``end`` select the periods that begin inside the range.  Not
+        cached: the slice is already O(1), cheaper than sizing a cache entry.
+        """
+        return self.level_index(level).rows(branch, start, end)
+
+    @shared
+    def forecast(self, method="seasonal_linear"):
+        """Every branch's forecast past the last month, fitted in one batch (see ``forecast``)."""
+        cube = self.cube if self.cube is not None else SalesCube.from_frame(self.index.df)
+        return fit_forecast(cube, method)
+
+    @shared
+    def branch_forecast(self, branch, start=None, end=None, method="seasonal_linear"):
+        """One branch's forecast months within the inclusive ``[start, end]`` range."""
+        return self.forecast(method).for_branch(branch, start, end)
+
+    @shared
+    def next_quarter_forecast(self, method="seasonal_linear"):
+        """``(label, totals)`` for the first full quarter after the data, largest Net_Sales first."""
+        label, totals = self.forecast(method).next_quarter()
+        return label, totals.sort_values("Net_Sales", ascending=False).reset_index(drop=True)
+
+    @shared
+    def monthly_series(self, branches=None):
+        """Per-month totals with the ratio columns (AOV etc.), all branches by default."""
+        return with_ratios(self.cube.monthly_totals(branches))
@@ -0,0 +1,135 @@
+"""Parallel loading of sharded sales extracts.
+
+Regions (or branch groups) export their own CSV in the usual
+``Branch,Month,Discount_Amount,Net_Sales,Orders`` schema.  ``load_shards``
+takes a directory or glob of those files, streams each changed shard into
+branch x month sums in a process pool (one shard per worker), and merges
+the partial results into one store.
+
+Each shard's sums are cached next to the main store, so a restart after
+one region re-exports only re-parses that region.  Overlapping
+``(Branch, Month)`` keys across shards are resolved by ``conflict``:
+
+``"last"``   the shard that sorts last wins (the default, as with drops)
+``"first"``  the shard that sorts first wins
+``"sum"``    the shards' values are added (shards split one branch's rows)
+``"error"``  raise ``ValueError`` listing the clashing keys
+"""
+import glob
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from data_store import (
+    CACHE_DIR, COLUMNS, METRIC_COLUMNS, STORE_FORMAT, ensure_store, frame_to_table,
+    read_meta, read_store, store_is_current, write_store,
+)
+
+CONFLICT_POLICIES = ("last", "first", "sum", "error")
+SHARD_PATTERN = "*.csv"
+
+
+def is_sharded(source):
+    """True if ``source`` names a directory or a glob rather than one CSV."""
+    return os.path.isdir(source) or glob.has_magic(source)
+
+
+def shard_paths(source):
+    """The shard files for a directory or glob, sorted by path."""
+    pattern = os.path.join(source, SHARD_PATTERN) if os.path.isdir(source) else source
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"no shard files match {pattern!r}")
+    names = [os.path.basename(p) for p in paths]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{source}: shard file names must be unique")
+    return paths
+
+
+def store_key(source):
+    """Stand-in CSV path that names the merged store of ``source``."""
+    digest = hashlib.blake2b(os.path.abspath(source).encode(), digest_size=6).hexdigest()
+    return f"shards-{digest}.csv"
+
+
+# ---- Per-shard aggregation ----
+def _aggregate_shard(path, cache_dir):
+    """Worker: bring one shard's monthly-sums store up to date."""
+    return ensure_store(path, cache_dir, stream=True)
+
+
+def _shard_stores(paths, cache_dir, workers):
+    """``(store_path, meta)`` per shard, rebuilding stale ones in parallel.
+
+    Workers are spawned rather than forked: a refresh can run this inside a
+    server with other threads, and a fork could copy their held locks.
+    """
+    stale = [p for p in paths if not store_is_current(p, cache_dir)]
+    workers = min(workers or os.cpu_count() or 1, len(stale))
+    if workers > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            list(pool.map(_aggregate_shard, stale, [cache_dir] * len(stale)))
+    else:
+        for path in stale:
+            _aggregate_shard(path, cache_dir)
+    return [read_meta(p, cache_dir) for p in paths]
+
+
+# ---- Merge ----
+def combine_shards(frames, names, conflict="last"):
+    """Merge per-shard monthly frames, resolving shared ``(Branch, Month)`` keys."""
+    if conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"conflict must be one of {CONFLICT_POLICIES}, not {conflict!r}")
+    parts = []
+    for i, frame in enumerate(frames):
+        part = frame[COLUMNS].assign(Branch=frame["Branch"].astype(str))
+        part["_shard"] = i
+        parts.append(part)
+    rows = pd.concat(parts, ignore_index=True)
+
+    if conflict == "sum":
+        return rows.groupby(["Branch", "Month"], as_index=False, sort=False)[METRIC_COLUMNS].sum()
+
+    dup = rows.duplicated(["Branch", "Month"], keep=False)
+    if conflict == "error" and dup.any():
+        clash = rows[dup].groupby(["Branch", "Month"])["_shard"].agg(list)
+        listed = [f"{b} {m:%Y-%m} in {[names[i] for i in s]}" for (b, m), s in clash.head(5).items()]
+        raise ValueError(f"{len(clash)} (Branch, Month) keys appear in more than one shard: "
+                         + "; ".join(listed))
+    keep = "first" if conflict == "first" else "last"
+    return rows.drop_duplicates(["Branch", "Month"], keep=keep)[COLUMNS]
+
+
+def load_shards(source, cache_dir=CACHE_DIR, workers=None, conflict="last"):
+    """Load a directory or glob of shards as one frame; returns ``(df, meta)``.
+
+    ``workers`` caps the process pool (default: one per core).  The merged
+    store is reused while no shard and the conflict policy are unchanged;
+    drops appended to it (see ``SalesDataset``) are kept until then.
+    """
+    paths = shard_paths(source)
+    stores = _shard_stores(paths, os.path.join(cache_dir, "shards"), workers)
+
+    h = hashlib.blake2b(conflict.encode(), digest_size=16)
+    shard_hashes = {}
+    for path, (_, meta) in zip(paths, stores):
+        name = os.path.basename(path)
+        shard_hashes[name] = meta["hash"]
+        h.update(f"{name}:{meta['hash']};".encode())
+    digest = h.hexdigest()
+
+    key = store_key(source)
+    store_path, meta = read_meta(key, cache_dir)
+    if (meta is None or meta.get("hash") != digest or meta.get("format") != STORE_FORMAT
+            or not os.path.exists(store_path)):
+        frames = [feather.read_table(p).to_pandas(date_as_object=False) for p, _ in stores]
+        merged = combine_shards(frames, list(shard_hashes), conflict)
+        meta = {"hash": digest, "format": STORE_FORMAT, "drops": {}, "streamed": True,
+                "shards": shard_hashes, "conflict": conflict}
+        store_path = write_store(key, frame_to_table(merged), meta, cache_dir)
+    return read_store(store_path, meta), meta
@@ -0,0 +1,179 @@
+"""Process-wide cache of derived results shared by every session.
+
+``SharedCache`` is an LRU bounded by an estimated memory budget rather than
+an entry count, with an optional TTL and hit/miss counters.  Concurrent
+misses on the same key are collapsed: the first caller computes the value
+and the others wait for it, so many viewers opening the same branch at
+once cost one computation.
+
+Keys are expected to include the data version as one of their top-level
+elements, so a refresh never serves stale results.  ``set_version`` tells
+the cache which version is current: entries of any other version are
+dropped at once, and late results for an old version are not stored.
+Cached values are shared between sessions and must be treated as read-only.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUDGET = 64 * 2**20
+
+
+def _frame_size(value):
+    """Bytes a frame or series holds itself.
+
+    Categorical columns count their codes only (the categories are the
+    dataset's), and read-only column buffers, views of the memory-mapped
+    store, count nothing.
+    """
+    columns = value.items() if isinstance(value, pd.DataFrame) else [(None, value)]
+    size = value.index.memory_usage(deep=True)
+    for _, col in columns:
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            size += col.array.codes.nbytes
+        elif isinstance(col.dtype, np.dtype) and not col.to_numpy().flags.writeable:
+            continue
+        else:
+            size += col.memory_usage(index=False, deep=True)
+    return int(size)
+
+
+def sizeof(value):
+    """Rough size in bytes of a cached value (frames, arrays, dataclasses, containers)."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return _frame_size(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes if value.flags.writeable else 0
+    if is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(sizeof(getattr(value, f.name)) for f in fields(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class SharedCache:
+    """Thread-safe, memory-bounded LRU with TTL, stats and single-flight misses.
+
+    ``max_bytes`` caps the summed ``sizer(value)`` of the entries; the least
+    recently used ones are evicted past it.  ``ttl`` (seconds, ``None`` for
+    no expiry) bounds how long an entry is served after it was built.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET, ttl=None, sizer=sizeof):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizer = sizer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.nbytes = 0
+        self.version = None
+        # key -> (value, size, built_at)
+        self._items = OrderedDict()
+        # key -> Event set when the in-flight build finishes
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def _lookup(self, key):
+        """The live entry for ``key`` (dropping it if expired); call with the lock held."""
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+            self._drop(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def _drop(self, key):
+        _, size, _ = self._items.pop(key)
+        self.nbytes -= size
+
+    def get(self, key, build):
+        """Return the value for ``key``, calling ``build()`` on a miss."""
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                waiting = self._pending.get(key)
+                if waiting is None:
+                    self.misses += 1
+                    done = self._pending[key] = threading.Event()
+                    break
+            # Another session is building this key; use its result (or retry if it failed)
+            waiting.wait()
+
+        try:
+            value = build()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            done.set()
+
+    def _is_current(self, key):
+        return self.version is None or self.version in key
+
+    def set_version(self, version):
+        """Make ``version`` current, dropping the entries of every other one."""
+        with self._lock:
+            if version == self.version:
+                return
+            self.version = version
+            for key in [k for k in self._items if not self._is_current(k)]:
+                self._drop(key)
+                self.invalidations += 1
+
+    def put(self, key, value):
+        size = self.sizer(value)
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            if size > self.max_bytes or not self._is_current(key):
+                return
+            self._items[key] = (value, size, time.monotonic())
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._items)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "version": self.version,
+            }
@@ -0,0 +1,187 @@
+"""Optional DuckDB backend for the engine's aggregate queries.
+
+``DuckDBEngine`` answers the KPI, year, YoY, contribution, period and
+branch-total queries as SQL aggregations over the stored data, scanned in
+place (the memory-mapped Feather store, or a Parquet/CSV file), and only
+the small result tables come back as pandas.  Results are the same objects
+``SalesEngine`` returns, so the tabs do not know which backend they use.
+
+Per-branch chart series still come from the branch index: they are already
+zero-copy slices of the monthly rollup.  This is an alternative query path
+over a loaded ``SalesDataset``, not a way to serve extracts too large to
+load: the dataset's frame, rollups and index stay in memory (the charts,
+the forecast and the year list read them), so memory use is the same as
+with the pandas engine.
+
+DuckDB is not a hard dependency; ``available()`` tells whether it can be
+imported, and ``SALES_BACKEND=duckdb`` selects it in the dashboard.
+"""
+import os
+import threading
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from aggregates import METRICS
+from metrics import with_ratios
+from sales_engine import MonthRange, PeriodTotals, SalesEngine, SalesFilter, Totals, shared
+
+try:
+    import duckdb
+except ImportError:  # optional dependency
+    duckdb = None
+
+# Month ordinal (year * 12 + month - 1), as in aggregates.month_ordinal
+_ORD = "(year(Month) * 12 + month(Month) - 1)"
+_SUMS = ", ".join(f"coalesce(sum({m}), 0) AS {m}" for m in METRICS)
+
+
+def available():
+    return duckdb is not None
+
+
+def _literal(text):
+    """``text`` as a SQL string literal (view definitions take no parameters)."""
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def _ordinal(ts):
+    ts = pd.Timestamp(ts)
+    return ts.year * 12 + ts.month - 1
+
+
+def _where(branches=None, lo=None, hi=None):
+    """SQL condition and parameters for a branch set and a half-open ordinal range."""
+    clauses, params = [], []
+    if branches is not None:
+        if isinstance(branches, str):
+            branches = [branches]
+        clauses.append("list_contains(?, Branch)")
+        params.append(list(branches))
+    if lo is not None:
+        clauses.append("Ord >= ?")
+        params.append(lo)
+    if hi is not None:
+        clauses.append("Ord < ?")
+        params.append(hi)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class DuckDBEngine(SalesEngine):
+    """``SalesEngine`` whose aggregate queries run in an in-process DuckDB.
+
+    ``source`` is the Feather store (scanned through a memory-mapped Arrow
+    table), a ``.parquet`` file or a ``.csv`` in the usual schema.  Queries
+    share one connection under a lock; each returns a few rows.
+    """
+
+    def __init__(self, source, index, level_index=None, cache=None, version=None):
+        if duckdb is None:
+            raise ImportError("DuckDBEngine needs the duckdb package (pip install duckdb)")
+        super().__init__(None, index, level_index, cache, version)
+        self.source = source
+        self._lock = threading.Lock()
+        self._con = duckdb.connect()
+        ext = os.path.splitext(source)[1].lower()
+        if ext == ".parquet":
+            scan = f"read_parquet({_literal(source)})"
+        elif ext == ".csv":
+            scan = f"read_csv_auto({_literal(source)})"
+        else:
+            self._con.register("store", feather.read_table(source, memory_map=True))
+            scan = "store"
+        self._con.execute(f"""
+            CREATE VIEW sales AS
+            SELECT CAST(Branch AS VARCHAR) AS Branch, CAST(Month AS TIMESTAMP) AS Month,
+                   {_ORD} AS Ord, Discount_Amount, Net_Sales, Orders
+            FROM {scan} WHERE Month IS NOT NULL
+        """)
+        self._years = None
+
+    @classmethod
+    def from_dataset(cls, dataset, cache=None):
+        """Engine over ``dataset``'s store file and its current snapshot's branch index."""
+        data = dataset.snapshot
+        return cls(dataset.store_file, data.index, data.level_index, cache, data.version)
+
+    def query(self, sql, params=()):
+        """Run ``sql`` against the ``sales`` view; returns a DataFrame."""
+        with self._lock:
+            return self._con.execute(sql, list(params)).df()
+
+    def _totals(self, branches=None, lo=None, hi=None):
+        where, params = _where(branches, lo, hi)
+        row = self.query(f"SELECT {_SUMS} FROM sales{where}", params).iloc[0]
+        return Totals.from_dict(row.to_dict())
+
+    @staticmethod
+    def _bounds(start=None, end=None):
+        """Half-open ordinals for an inclusive ``[start, end]`` month range."""
+        return (None if start is None else _ordinal(start),
+                None if end is None else _ordinal(end) + 1)
+
+    @property
+    def years(self):
+        if self._years is None:
+            years = self.query("SELECT DISTINCT year(Month) AS y FROM sales ORDER BY y")["y"]
+            self._years = [int(y) for y in years]
+        return self._years
+
+    @shared
+    def kpis(self, filter=None):
+        filter = filter or SalesFilter()
+        return self._totals(filter.branches, *self._bounds(filter.start, filter.end))
+
+    @shared
+    def year_kpis(self, year, branches=None):
+        return self._totals(branches, year * 12, year * 12 + 12)
+
+    @shared
+    def contribution(self, start=None, end=None):
+        where, params = _where(None, *self._bounds(start, end))
+        table = self.query(f"""
+            SELECT Branch, sum(Net_Sales) AS Net_Sales FROM sales{where}
+            GROUP BY Branch ORDER BY Branch
+        """, params)
+        total = table["Net_Sales"].sum()
+        table["Contribution %"] = (table["Net_Sales"] / total * 100).round(2)
+        return table.sort_values("Net_Sales", ascending=False).reset_index(drop=True)
+
+    @shared
+    def period_compare(self, branches, *periods):
+        ranges = [p if isinstance(p, MonthRange) else MonthRange.between(*p) for p in periods]
+        where, params = _where(branches)
+        # One scan: each row is counted in every period whose range holds its month
+        periods_sql = ", ".join("(?, ?, ?)" for _ in ranges)
+        table = self.query(f"""
+            WITH periods(p, lo, hi) AS (VALUES {periods_sql})
+            SELECT p, {", ".join(f"coalesce(sum(s.{m}), 0) AS {m}" for m in METRICS)}
+            FROM periods LEFT JOIN (SELECT * FROM sales{where}) s ON s.Ord >= lo AND s.Ord < hi
+            GROUP BY p ORDER BY p
+        """, [v for i, r in enumerate(ranges) for v in (i, r.start, r.stop)] + params)
+        return [
+            PeriodTotals(r.first, r.last, Totals.from_dict(row))
+            for r, row in zip(ranges, table[METRICS].to_dict("records"))
+        ]
+
+    @shared
+    def branch_totals(self, branches=None, start=None, end=None):
+        where, params = _where(branches, *self._bounds(start, end))
+        out = self.query(f"""
+            SELECT Branch, {", ".join(f"sum({m}) AS {m}" for m in METRICS)}
+            FROM sales{where} GROUP BY Branch ORDER BY Branch
+        """, params)
+        out["Orders"] = out["Orders"].round().astype("int64")
+        return out
+
+    @shared
+    def monthly_series(self, branches=None):
+        where, params = _where(branches)
+        out = self.query(f"""
+            SELECT date_trunc('month', Month) AS Month, {", ".join(f"sum({m}) AS {m}" for m in METRICS)}
+            FROM sales{where} GROUP BY 1 ORDER BY 1
+        """, params)
+        out["Month"] = out["Month"].astype("datetime64[ns]")
+        out.insert(1, "Month_Label", out["Month"].dt.strftime("%b %Y"))
+        out["Orders"] = out["Orders"].round().astype("int64")
+        return with_ratios(out)
@@ -0,0 +1,107 @@
+"""Incremental cube updates and drop merges.
+
+Run with ``python -m pytest`` from the repo root.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import SalesCube
+from data_store import add_derived_columns
+from ingest import merge_rows
+
+
+def frame(rows):
+    """Monthly frame from ``(branch, "YYYY-MM", discount, net, orders)`` tuples, sorted as loaded."""
+    df = pd.DataFrame(rows, columns=["Branch", "Month", "Discount_Amount", "Net_Sales", "Orders"])
+    df["Month"] = pd.to_datetime(df["Month"], format="%Y-%m")
+    df["Orders"] = df["Orders"].astype("int32")
+    df["Branch"] = df["Branch"].astype("category")
+    df = df.sort_values(["Branch", "Month"], ignore_index=True)
+    return add_derived_columns(df)
+
+
+def assert_same_cube(actual, expected):
+    assert actual.branches == expected.branches
+    assert actual.first_month == expected.first_month
+    np.testing.assert_allclose(actual.cum, expected.cum)
+    np.testing.assert_array_equal(actual.count_cum, expected.count_cum)
+
+
+BASE = frame([
+    ("AirPort", "2024-03", 10.0, 100.0, 5),
+    ("AirPort", "2024-04", 12.0, 120.0, 6),
+    ("AirPort", "2024-06", 8.0, 90.0, 4),
+    ("Mall", "2024-04", 5.0, 50.0, 3),
+    ("Mall", "2024-05", 6.0, 70.0, 4),
+])
+
+
+# ---- SalesCube.with_rows ----
+def test_with_rows_matches_rebuild_for_new_branches_and_months():
+    added = frame([
+        ("AirPort", "2024-08", 3.0, 30.0, 2),       # past the last month
+        ("Center", "2024-05", 4.0, 40.0, 2),        # new branch
+        ("Mall", "2023-11", 7.0, 75.0, 3),          # before the first month
+    ])
+    cube = SalesCube.from_frame(BASE).with_rows(added)
+    assert_same_cube(cube, SalesCube.from_frame(pd.concat([BASE, added], ignore_index=True)))
+    assert cube.years == [2023, 2024]
+
+
+def test_with_rows_leaves_the_original_cube_unchanged():
+    before = SalesCube.from_frame(BASE)
+    cum, count_cum = before.cum.copy(), before.count_cum.copy()
+    before.with_rows(frame([("AirPort", "2024-01", 1.0, 10.0, 1)]))
+    np.testing.assert_array_equal(before.cum, cum)
+    np.testing.assert_array_equal(before.count_cum, count_cum)
+
+
+def test_with_rows_on_an_empty_cube_builds_from_the_rows():
+    cube = SalesCube.from_frame(BASE.iloc[:0]).with_rows(BASE)
+    assert_same_cube(cube, SalesCube.from_frame(BASE))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_with_rows_matches_rebuild_on_random_drops(seed):
+    rng = np.random.default_rng(seed)
+    cube, rows = SalesCube.from_frame(BASE), BASE
+    for _ in range(4):
+        n = int(rng.integers(1, 6))
+        drop = frame([
+            (f"B{rng.integers(0, 6)}", f"{rng.integers(2023, 2026)}-{rng.integers(1, 13):02d}",
+             float(rng.integers(0, 50)), float(rng.integers(0, 500)), int(rng.integers(0, 30)))
+            for _ in range(n)
+        ]).drop_duplicates(["Branch", "Month"])
+        cube = cube.with_rows(drop)
+        rows = pd.concat([rows, drop], ignore_index=True)
+    assert_same_cube(cube, SalesCube.from_frame(rows))
+
+
+# ---- merge_rows ----
+def test_merge_rows_replaces_an_existing_branch_month():
+    new = frame([
+        ("Mall", "2024-05", 9.0, 99.0, 9),          # replaces Mall 2024-05
+        ("Mall", "2024-07", 1.0, 11.0, 1),          # new month
+    ])
+    merged, replaced = merge_rows(BASE, new)
+
+    assert len(merged) == len(BASE) + 1
+    assert replaced[["Branch", "Month"]].astype(str).values.tolist() == [["Mall", "2024-05-01"]]
+    assert replaced["Net_Sales"].tolist() == [70.0]
+    row = merged[(merged["Branch"] == "Mall") & (merged["Month"] == "2024-05-01")]
+    assert row["Net_Sales"].tolist() == [99.0]
+    assert row["AOV"].tolist() == [11.0]
+    assert merged.equals(merged.sort_values(["Branch", "Month"], ignore_index=True))
+
+    cube = SalesCube.from_frame(BASE).with_rows(new, replaced)
+    assert_same_cube(cube, SalesCube.from_frame(merged))
+    assert cube.period_totals()["Net_Sales"] == pytest.approx(BASE["Net_Sales"].sum() - 70.0 + 99.0 + 11.0)
+
+
+def test_merge_rows_adds_a_new_branch_category():
+    merged, replaced = merge_rows(BASE, frame([("Center", "2024-04", 2.0, 20.0, 1)]))
+    assert replaced.empty
+    assert list(merged["Branch"].cat.categories) == ["AirPort", "Center", "Mall"]
+    assert merged["Branch"].astype(str).tolist() == ["AirPort"] * 3 + ["Center"] + ["Mall"] * 2
+
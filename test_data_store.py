@@ -0,0 +1,51 @@
+"""Columnar store loads: full vs streamed, and Month parsing."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import SalesCube
+from data_store import COLUMNS, aggregate_csv, load_store
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+    return str(path)
+
+
+ROWS = [
+    ("AirPort", "2024-01-03", 1.5, 20.25, 2),
+    ("AirPort", "2024-01-20", 0.5, 10.0, 1),
+    ("Mall", "2024-01", 2.0, 30.0, 3),
+    ("AirPort", "2024-02-01", 1.0, 12.5, 1),
+    ("Mall", "2024-03-31", 4.0, 44.0, 4),
+    ("Center", "2025-01", 3.0, 33.0, 2),
+]
+
+
+def test_streamed_load_matches_full_load(tmp_path):
+    csv = write_csv(tmp_path / "sales.csv", ROWS)
+    full, full_meta = load_store(csv, str(tmp_path / "full"), stream=False)
+    streamed, streamed_meta = load_store(csv, str(tmp_path / "streamed"), stream=True)
+
+    assert not full_meta["streamed"] and streamed_meta["streamed"]
+    assert len(full) == len(ROWS)
+    # The streamed store holds one row per branch per month
+    assert len(streamed) == 5
+    a, b = SalesCube.from_frame(full), SalesCube.from_frame(streamed)
+    assert a.branches == b.branches and a.first_month == b.first_month
+    np.testing.assert_allclose(a.cum, b.cum)
+
+
+def test_mixed_month_formats_survive_chunking(tmp_path):
+    # Each chunk starts with a different format; none of the rows may be lost
+    csv = write_csv(tmp_path / "sales.csv", ROWS)
+    out = aggregate_csv(csv, chunk_rows=2)
+    assert out["Net_Sales"].sum() == pytest.approx(sum(r[3] for r in ROWS))
+    assert sorted(out["Branch"].unique()) == ["AirPort", "Center", "Mall"]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_unparseable_months_raise(tmp_path, stream):
+    csv = write_csv(tmp_path / "sales.csv", ROWS + [("Mall", "March 2024", 1.0, 1.0, 1)])
+    with pytest.raises(ValueError, match="1 rows with a missing or unparseable Month"):
+        load_store(csv, str(tmp_path / "store"), stream=stream)
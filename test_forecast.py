@@ -0,0 +1,60 @@
+"""Batched forecasts: trend and seasonality, closed branches, quarter totals."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import SalesCube
+from data_store import add_derived_columns
+from forecast import fit
+
+MONTHS = pd.date_range("2023-01-01", "2025-12-01", freq="MS")
+SEASONAL = np.array([0, -10, 5, 20, 0, 10, 30, 25, -5, 0, 15, 40], dtype=float)
+
+
+def cube():
+    t = np.arange(len(MONTHS))
+    steady = 1000 + 10 * t + SEASONAL[MONTHS.month - 1]
+    df = pd.DataFrame({
+        "Branch": ["Steady"] * len(MONTHS) + ["Closed"] * 12,
+        "Month": list(MONTHS) + list(MONTHS[:12]),
+        "Discount_Amount": np.r_[steady / 10, np.full(12, 5.0)],
+        "Net_Sales": np.r_[steady, np.full(12, 50.0)],
+        "Orders": np.r_[np.full(len(MONTHS), 100), np.full(12, 5)],
+    })
+    df["Branch"] = df["Branch"].astype("category")
+    return SalesCube.from_frame(add_derived_columns(df))
+
+
+def test_seasonal_linear_follows_trend_and_season():
+    forecast = fit(cube())
+    rows = forecast.for_branch("Steady")
+    # The data ends in December, so the horizon is the next full quarter
+    assert rows["Month_Label"].tolist() == ["Jan 2026", "Feb 2026", "Mar 2026"]
+    t = np.arange(len(MONTHS), len(MONTHS) + 3)
+    expected = 1000 + 10 * t + SEASONAL[:3]
+    np.testing.assert_allclose(rows["Net_Sales"], expected, rtol=0.01)
+    assert (rows["Orders"] == 100).all()
+
+
+def test_closed_branches_are_forecast_at_zero():
+    for method in ("seasonal_linear", "seasonal_naive"):
+        assert fit(cube(), method).for_branch("Closed")["Net_Sales"].eq(0).all()
+
+
+def test_seasonal_naive_repeats_last_year():
+    rows = fit(cube(), "seasonal_naive").for_branch("Steady", end="2026-02-28")
+    last_year = 1000 + 10 * np.arange(24, 26) + SEASONAL[:2]
+    np.testing.assert_allclose(rows["Net_Sales"], last_year)
+
+
+def test_next_quarter_totals_each_branch():
+    label, totals = fit(cube()).next_quarter()
+    assert label == "Q1 2026"
+    steady = totals.set_index("Branch").loc["Steady"]
+    assert steady["Net_Sales"] == pytest.approx(fit(cube()).for_branch("Steady")["Net_Sales"].sum())
+    assert totals.set_index("Branch").loc["Closed", "Orders"] == 0
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError, match="method must be one of"):
+        fit(cube(), "prophet")
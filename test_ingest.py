@@ -0,0 +1,96 @@
+"""Drop ingestion: snapshots and merging monthly and order-level drops."""
+import pandas as pd
+import pytest
+
+from data_store import COLUMNS, add_derived_columns
+from ingest import DataSnapshot, SalesDataset
+from sales_engine import SalesEngine, SalesFilter
+
+BASE = [
+    ("AirPort", "2024-01", 1.0, 10.0, 1),
+    ("AirPort", "2024-02", 2.0, 20.0, 2),
+    ("Mall", "2024-01", 3.0, 30.0, 3),
+]
+
+
+def write_csv(path, rows):
+    path.parent.mkdir(exist_ok=True)
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+
+
+def dataset(tmp_path):
+    write_csv(tmp_path / "sales.csv", BASE)
+    return SalesDataset(str(tmp_path / "sales.csv"), str(tmp_path / "drops"), str(tmp_path / "cache"))
+
+
+def test_refresh_publishes_a_new_snapshot(tmp_path):
+    data = dataset(tmp_path)
+    before = data.snapshot
+    engine = SalesEngine.from_dataset(data)
+
+    write_csv(tmp_path / "drops" / "sales_2024-03.csv", [("AirPort", "2024-03", 1.0, 5.0, 1)])
+    assert data.refresh() == ["sales_2024-03.csv"]
+
+    after = data.snapshot
+    assert after is not before and after.version != before.version
+    # The engine and the old snapshot still see the data they were built from
+    assert engine.kpis().net_sales == 60.0 and engine.version == before.version
+    assert len(engine.branch_series("AirPort")) == 2
+    assert len(before.level_index("quarter").rows("AirPort")) == 1
+    assert SalesEngine.from_dataset(data).kpis().net_sales == 65.0
+    assert len(after.index.rows("AirPort")) == 3
+
+
+def test_order_level_drops_are_appended(tmp_path):
+    data = dataset(tmp_path)
+    orders = [
+        ("AirPort", "2024-03-05", 0.0, 4.0, 1),
+        ("AirPort", "2024-03-05", 1.0, 6.0, 1),     # same branch and day: a second order
+        ("Mall", "2024-02-01", 0.0, 2.0, 1),        # the 1st, but in a daily drop
+    ]
+    write_csv(tmp_path / "drops" / "sales_2024-03.csv", orders)
+    assert data.refresh() == ["sales_2024-03.csv"]
+    assert not data.rejected
+
+    engine = SalesEngine.from_dataset(data)
+    assert engine.kpis().net_sales == 72.0
+    assert engine.branch_series("AirPort")["Net_Sales"].tolist() == [10.0, 20.0, 10.0]
+    assert engine.kpis(SalesFilter("Mall", "2024-02-01", "2024-02-01")).orders == 1
+
+    # A monthly drop replaces every row of its branch and month, daily ones included
+    write_csv(tmp_path / "drops" / "sales_2024-03-fix.csv", [("AirPort", "2024-03", 0.0, 8.0, 2)])
+    data.refresh()
+    assert SalesEngine.from_dataset(data).branch_series("AirPort")["Net_Sales"].tolist() == [10.0, 20.0, 8.0]
+
+
+def test_a_changed_order_level_drop_is_rejected(tmp_path):
+    data = dataset(tmp_path)
+    drop = tmp_path / "drops" / "sales_2024-03.csv"
+    write_csv(drop, [("AirPort", "2024-03-05", 0.0, 4.0, 1)])
+    data.refresh()
+    write_csv(drop, [("AirPort", "2024-03-05", 0.0, 4.0, 1), ("AirPort", "2024-03-06", 0.0, 5.0, 1)])
+    assert data.refresh() == []
+    assert "only appended" in data.rejected["sales_2024-03.csv"][1]
+    assert data.cube.period_totals()["Net_Sales"] == 64.0
+
+
+@pytest.mark.parametrize("daily", [False, True])
+def test_incremental_refresh_matches_a_full_rebuild(tmp_path, daily):
+    rows = [(b, f"2024-{m:02d}-{d:02d}" if daily else f"2024-{m:02d}", 1.0, 10.0 * m + d, 1)
+            for b in ["AirPort", "Mall"] for m in range(1, 13) for d in ([3, 17] if daily else [1])]
+    write_csv(tmp_path / "sales.csv", rows)
+    data = SalesDataset(str(tmp_path / "sales.csv"), str(tmp_path / "drops"), str(tmp_path / "cache"))
+    # A new branch, a correction in the middle of the history and a new month
+    write_csv(tmp_path / "drops" / "sales_2025-01.csv", [
+        ("Center", "2024-06", 2.0, 50.0, 2),
+        ("Mall", "2024-03", 0.0, 7.0, 1),
+        ("AirPort", "2025-01", 1.0, 99.0, 3),
+    ])
+    data.refresh()
+
+    full = DataSnapshot.build(add_derived_columns(data.df[COLUMNS].copy()), data.meta)
+    assert data.df[COLUMNS].equals(full.df[COLUMNS])
+    pd.testing.assert_frame_equal(data.monthly.reset_index(drop=True), full.monthly[data.monthly.columns])
+    assert data.index.offsets == full.index.offsets
+    # Monthly data stays its own rollup
+    assert (data.monthly is data.df) is not daily
@@ -0,0 +1,29 @@
+"""Leaderboard selection and table paging."""
+import numpy as np
+import pandas as pd
+
+from ranking import page, page_count, top_n_indices
+
+VALUES = [5.0, np.nan, 9.0, 1.0, 9.0, 3.0]
+
+
+def test_top_n_is_best_first_and_skips_nan():
+    assert top_n_indices(VALUES, 3).tolist() == [2, 4, 0]
+    assert top_n_indices(VALUES, 2, largest=False).tolist() == [3, 5]
+    # Asking for more than there are values returns every ranked value
+    assert top_n_indices(VALUES, 10).tolist() == [2, 4, 0, 5, 3]
+
+
+def test_top_n_matches_a_full_sort():
+    values = np.random.default_rng(0).integers(0, 50, 1000).astype(float)
+    expected = np.argsort(-values, kind="stable")[:25]
+    assert top_n_indices(values, 25).tolist() == expected.tolist()
+    assert top_n_indices(values, 0).size == 0
+
+
+def test_page_clamps_to_the_last_page():
+    frame = pd.DataFrame({"x": range(7)})
+    assert page_count(len(frame), 3) == 3 and page_count(0, 3) == 1
+    assert page(frame, 3, 3)["x"].tolist() == [6]
+    assert page(frame, 9, 3)["x"].tolist() == [6]
+    assert page(frame, 0, 3)["x"].tolist() == [0, 1, 2]
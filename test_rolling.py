@@ -0,0 +1,46 @@
+"""YTD, trailing-window and month-over-month columns of the monthly rollup."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import add_rolling_columns
+from data_store import add_derived_columns
+
+
+def frame(rows):
+    """Monthly frame from ``(branch, "YYYY-MM", discount, net, orders)`` tuples, sorted as loaded."""
+    df = pd.DataFrame(rows, columns=["Branch", "Month", "Discount_Amount", "Net_Sales", "Orders"])
+    df["Month"] = pd.to_datetime(df["Month"], format="%Y-%m")
+    df["Orders"] = df["Orders"].astype("int32")
+    df["Branch"] = df["Branch"].astype("category")
+    df = df.sort_values(["Branch", "Month"], ignore_index=True)
+    return add_derived_columns(df)
+
+
+def test_rolling_windows_across_a_year_boundary():
+    df = add_rolling_columns(frame([
+        ("AirPort", "2024-11", 0.0, 10.0, 1),
+        ("AirPort", "2024-12", 0.0, 20.0, 1),
+        # no January row: the windows count it as zero
+        ("AirPort", "2025-02", 0.0, 40.0, 1),
+        ("AirPort", "2025-03", 0.0, 80.0, 1),
+        ("Mall", "2025-01", 0.0, 5.0, 1),
+    ]))
+    air = df[df["Branch"] == "AirPort"]
+    air = air.set_index(air["Month"].dt.strftime("%Y-%m"))
+
+    # YTD restarts in January
+    assert air["Net_Sales_YTD"].tolist() == [10.0, 30.0, 40.0, 120.0]
+    # Trailing windows run over calendar months, across the year end
+    assert air["Net_Sales_T3M"].tolist() == [10.0, 30.0, 60.0, 120.0]
+    assert air["Net_Sales_T12M"].tolist() == [10.0, 30.0, 70.0, 150.0]
+    # MoM needs the previous calendar month
+    mom = air["Net_Sales_MoM"]
+    assert np.isnan(mom["2024-11"]) and np.isnan(mom["2025-02"])
+    assert mom["2024-12"] == pytest.approx(100.0)
+    assert mom["2025-03"] == pytest.approx(100.0)
+
+    # Windows never reach into another branch's rows
+    mall = df[df["Branch"] == "Mall"].iloc[0]
+    assert (mall["Net_Sales_YTD"], mall["Net_Sales_T3M"], mall["Net_Sales_T12M"]) == (5.0, 5.0, 5.0)
+    assert np.isnan(mall["Net_Sales_MoM"])
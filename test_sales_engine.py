@@ -0,0 +1,46 @@
+"""MonthRange validation and period comparisons."""
+import pandas as pd
+import pytest
+
+from aggregates import SalesCube
+from data_store import BranchIndex, add_derived_columns
+from sales_engine import MonthRange, SalesEngine
+
+
+def test_between_includes_the_end_month_whatever_its_day():
+    r = MonthRange.between("2024-01-15", "2024-06-30")
+    assert r.stop - r.start == 6
+    assert (r.first, r.last) == (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-06-01"))
+    assert MonthRange.between("2024-03-31", "2024-03-01") == MonthRange.between("2024-03-01", "2024-03-31")
+
+
+def test_a_period_ending_before_it_starts_is_rejected():
+    with pytest.raises(ValueError, match=r"period start \(May 2024\) must come before its end"):
+        MonthRange.between("2024-05-01", "2024-04-30")
+
+
+def engine():
+    df = pd.DataFrame({
+        "Branch": pd.Categorical(["AirPort", "AirPort", "AirPort", "Mall"]),
+        "Month": pd.to_datetime(["2024-01-01", "2024-02-01", "2025-01-01", "2024-02-01"]),
+        "Discount_Amount": [1.0, 2.0, 3.0, 4.0],
+        "Net_Sales": [10.0, 20.0, 30.0, 40.0],
+        "Orders": [1, 2, 3, 4],
+    })
+    df = add_derived_columns(df)
+    return SalesEngine(SalesCube.from_frame(df), BranchIndex(df))
+
+
+def test_period_compare_totals_each_period():
+    first, second, third = engine().period_compare(
+        ["AirPort"], ("2024-01-01", "2024-02-29"), MonthRange.between("2025-01-01", "2025-12-31"),
+        ("2023-01-01", "2023-12-31"),
+    )
+    assert first.totals.net_sales == 30.0 and first.end == pd.Timestamp("2024-02-01")
+    assert second.totals.orders == 3
+    assert third.totals.net_sales == 0
+
+
+def test_period_compare_rejects_a_reversed_period():
+    with pytest.raises(ValueError):
+        engine().period_compare(None, ("2024-02-01", "2024-01-01"))
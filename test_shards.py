@@ -0,0 +1,49 @@
+"""Sharded loads: conflict policies for keys shared between shards."""
+import pandas as pd
+import pytest
+
+from data_store import COLUMNS
+from shards import combine_shards, load_shards
+
+
+def shard(rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df["Month"] = pd.to_datetime(df["Month"], format="%Y-%m")
+    df["Branch"] = df["Branch"].astype("category")
+    return df
+
+
+NORTH = shard([("AirPort", "2024-01", 1.0, 10.0, 1), ("Mall", "2024-01", 2.0, 20.0, 2)])
+SOUTH = shard([("AirPort", "2024-01", 3.0, 30.0, 3), ("Center", "2024-01", 4.0, 40.0, 4)])
+
+
+def airport_sales(merged):
+    return merged.loc[merged["Branch"] == "AirPort", "Net_Sales"].tolist()
+
+
+@pytest.mark.parametrize("conflict, expected", [("last", [30.0]), ("first", [10.0]), ("sum", [40.0])])
+def test_conflict_policies(conflict, expected):
+    merged = combine_shards([NORTH, SOUTH], ["north.csv", "south.csv"], conflict)
+    assert airport_sales(merged) == expected
+    assert sorted(merged["Branch"]) == ["AirPort", "Center", "Mall"]
+
+
+def test_conflict_error_names_the_shards():
+    with pytest.raises(ValueError, match=r"AirPort 2024-01 in \['north.csv', 'south.csv'\]"):
+        combine_shards([NORTH, SOUTH], ["north.csv", "south.csv"], "error")
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="conflict must be one of"):
+        combine_shards([NORTH], ["north.csv"], "newest")
+
+
+def test_load_shards_applies_the_policy_in_sorted_order(tmp_path):
+    shard_dir = tmp_path / "regions"
+    shard_dir.mkdir()
+    NORTH.assign(Month=NORTH["Month"].dt.strftime("%Y-%m")).to_csv(shard_dir / "a_north.csv", index=False)
+    SOUTH.assign(Month=SOUTH["Month"].dt.strftime("%Y-%m")).to_csv(shard_dir / "b_south.csv", index=False)
+
+    df, meta = load_shards(str(shard_dir), str(tmp_path / "cache"), workers=1, conflict="first")
+    assert airport_sales(df) == [10.0]
+    assert meta["conflict"] == "first" and sorted(meta["shards"]) == ["a_north.csv", "b_south.csv"]
@@ -0,0 +1,82 @@
+"""SharedCache: budget, TTL, single-flight misses and data versions."""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from shared_cache import SharedCache, sizeof
+
+
+def test_concurrent_misses_build_once():
+    cache = SharedCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(("k", "v1"), build)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == ["value"] * 8
+    assert cache.stats()["misses"] == 1
+
+
+def test_failed_build_is_retried_by_the_next_caller():
+    cache = SharedCache()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    try:
+        cache.get("k", fail)
+    except RuntimeError:
+        pass
+    assert cache.get("k", lambda: 42) == 42
+
+
+def test_entries_expire_after_ttl():
+    cache = SharedCache(ttl=0.01)
+    cache.get("k", lambda: 1)
+    time.sleep(0.02)
+    assert cache.get("k", lambda: 2) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_eviction_keeps_the_budget():
+    cache = SharedCache(max_bytes=2500)
+    for key in "abc":
+        cache.get(key, lambda: np.zeros(100))      # 800 bytes each
+    cache.get("a", lambda: None)                   # touch: "b" is now the oldest
+    cache.get("d", lambda: np.zeros(100))
+    assert "b" not in cache and all(k in cache for k in "acd")
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.stats()["evictions"] == 1
+
+
+def test_set_version_drops_old_entries_and_late_results():
+    cache = SharedCache()
+    cache.get(("engine", "kpis", "v1"), lambda: 1)
+    cache.set_version("v2")
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
+
+    # A build for the old version that finishes late is returned but not stored
+    assert cache.get(("engine", "kpis", "v1"), lambda: 1) == 1
+    assert len(cache) == 0
+    cache.get(("engine", "kpis", "v2"), lambda: 2)
+    assert len(cache) == 1
+
+
+def test_sizeof_skips_shared_category_dictionaries():
+    branches = pd.Categorical([f"Branch {i:05d}" for i in range(5000)])
+    slice_ = pd.DataFrame({"Branch": branches, "Net_Sales": np.arange(5000.0)}).iloc[:20]
+    # 20 int16 codes + 20 float64 values + the index, not the 5,000 names
+    assert sizeof(slice_) < 1000
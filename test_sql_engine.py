@@ -0,0 +1,41 @@
+"""DuckDB backend: same answers as the pandas engine, any source path."""
+import pandas as pd
+import pytest
+
+from aggregates import SalesCube
+from data_store import COLUMNS, BranchIndex, add_derived_columns
+from sales_engine import SalesEngine, SalesFilter
+
+pytest.importorskip("duckdb")
+from sql_engine import DuckDBEngine  # noqa: E402
+
+ROWS = [
+    ("AirPort", "2024-01-01", 1.0, 10.0, 1),
+    ("AirPort", "2025-03-01", 2.0, 20.0, 2),
+    ("Mall", "2024-02-01", 3.0, 30.0, 3),
+]
+
+
+def frame():
+    df = pd.DataFrame(ROWS, columns=COLUMNS)
+    df["Month"] = pd.to_datetime(df["Month"])
+    df["Branch"] = df["Branch"].astype("category")
+    return add_derived_columns(df)
+
+
+@pytest.mark.parametrize("ext", ["csv", "parquet"])
+def test_quotes_in_the_source_path(tmp_path, ext):
+    folder = tmp_path / "o'brien"
+    folder.mkdir()
+    path = str(folder / f"sales.{ext}")
+    df = frame()
+    if ext == "csv":
+        df[COLUMNS].to_csv(path, index=False)
+    else:
+        df[COLUMNS].assign(Branch=df["Branch"].astype(str)).to_parquet(path)
+
+    sql = DuckDBEngine(path, BranchIndex(df))
+    pandas = SalesEngine(SalesCube.from_frame(df), BranchIndex(df))
+    assert sql.years == pandas.years == [2024, 2025]
+    assert sql.kpis() == pandas.kpis()
+    assert sql.kpis(SalesFilter.for_year(2024, "Mall")) == pandas.kpis(SalesFilter.for_year(2024, "Mall"))
@@ -0,0 +1,175 @@
+"""Background warm-up of the shared caches after a load or data refresh.
+
+The first session after a deploy or a data change would otherwise pay for
+every query and figure it touches.  ``Warmer.ensure(version, jobs)`` runs
+the common views for a data version in a small thread pool as soon as the
+version is first seen, filling the ``SharedCache``/``FigureCache`` that all
+sessions read.  A session asking for a view that is still being built waits
+for that build (the caches collapse concurrent misses) instead of repeating
+it.
+
+Jobs run in the order given, all-branches views first.  Per-branch views
+are limited to a few branches (the default one, then the largest by
+Net_Sales), and the warm-up stops early once it has filled its share of
+any watched cache's budget or caused an eviction, so it never pushes out
+the views it built first.
+
+``Warmup.ready`` turns true once every job has finished or been skipped;
+``status()`` reports progress and failures.  A new version cancels the jobs
+of the old one that have not started yet.
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+DEFAULT_BRANCHES = 20
+# Fraction of each cache's budget the warm-up may fill; the rest is left to live sessions
+BUDGET_SHARE = 0.5
+
+
+def top_branches(engine, n, first=None):
+    """Up to ``n`` branches to warm: ``first``, then the largest by Net_Sales."""
+    ranked = [first] if first is not None else []
+    ranked += [b for b in engine.contribution()["Branch"] if b != first]
+    return ranked[:max(n, 0)]
+
+
+def engine_jobs(engine):
+    """``(name, fn)`` pairs for the all-branches engine queries every session starts from."""
+    years = engine.years
+    jobs = [
+        ("kpis", engine.kpis),
+        ("contribution", engine.contribution),
+        ("branch_metrics", engine.branch_metrics),
+        ("next_quarter_forecast", engine.next_quarter_forecast),
+        ("monthly_series", engine.monthly_series),
+    ]
+    jobs += [(f"year_kpis {year}", lambda year=year: engine.year_kpis(year)) for year in years]
+    jobs += [(f"yoy {a}->{b}", lambda a=a, b=b: engine.yoy_growth(None, a, b))
+             for a, b in itertools.combinations(years, 2)]
+    return jobs
+
+
+def branch_jobs(engine, branch):
+    """``(name, fn)`` pairs for one branch's engine queries."""
+    jobs = [(f"monthly_series {branch}", lambda: engine.monthly_series(branch))]
+    jobs += [(f"year_kpis {year} {branch}", lambda year=year: engine.year_kpis(year, branch))
+             for year in engine.years]
+    return jobs
+
+
+class Warmup:
+    """One version's warm-up jobs, run in order by a small thread pool.
+
+    ``caches`` are watched while the jobs run: once one of them holds more
+    than ``share`` of its budget or has evicted an entry, the remaining jobs
+    are skipped.
+    """
+
+    def __init__(self, version, jobs, workers=DEFAULT_WORKERS, caches=(), share=BUDGET_SHARE):
+        self.version = version
+        self.jobs = list(jobs)
+        self.done = 0
+        self.skipped = 0
+        self.failed = {}
+        self.started = time.monotonic()
+        self.finished = None
+        self.caches = list(caches)
+        self.share = share
+        self._evictions = [cache.evictions for cache in self.caches]
+        self._next = 0
+        self._cancelled = False
+        self._running = max(workers, 1)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=self._running, thread_name_prefix="warmup")
+        for _ in range(self._running):
+            self._pool.submit(self._drain)
+        self._pool.shutdown(wait=False)
+
+    def over_budget(self):
+        return any(
+            cache.nbytes > cache.max_bytes * self.share or cache.evictions > evictions
+            for cache, evictions in zip(self.caches, self._evictions)
+        )
+
+    def _take(self):
+        """The next job to run, or ``None`` when done, cancelled or over budget."""
+        with self._lock:
+            if self._next < len(self.jobs) and not self._cancelled and self.over_budget():
+                self.skipped += len(self.jobs) - self._next
+                self._next = len(self.jobs)
+            if self._cancelled or self._next == len(self.jobs):
+                return None
+            self._next += 1
+            return self.jobs[self._next - 1]
+
+    def _drain(self):
+        while True:
+            job = self._take()
+            if job is None:
+                break
+            name, fn = job
+            try:
+                fn()
+            except Exception as exc:  # a failed view is rebuilt on demand, not fatal
+                with self._lock:
+                    self.failed[name] = repr(exc)
+            with self._lock:
+                self.done += 1
+        with self._lock:
+            self._running -= 1
+            if self._running == 0:
+                self._finish()
+
+    def _finish(self):
+        self.finished = time.monotonic()
+        self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        """Block until every job has finished or been skipped; returns ``ready``."""
+        return self._ready.wait(timeout)
+
+    def cancel(self):
+        """Drop the jobs that have not started (running ones finish)."""
+        with self._lock:
+            self._cancelled = True
+
+    def status(self):
+        with self._lock:
+            end = self.finished if self.finished is not None else time.monotonic()
+            return {
+                "version": self.version,
+                "ready": self.ready,
+                "done": self.done,
+                "skipped": self.skipped,
+                "total": len(self.jobs),
+                "failed": dict(self.failed),
+                "seconds": round(end - self.started, 3),
+            }
+
+
+class Warmer:
+    """Keeps one ``Warmup`` per process, restarted when the data version changes."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, caches=(), share=BUDGET_SHARE):
+        self.workers = workers
+        self.caches = list(caches)
+        self.share = share
+        self.current = None
+        self._lock = threading.Lock()
+
+    def ensure(self, version, jobs):
+        """The warm-up for ``version``, starting it from ``jobs()`` if it is new."""
+        with self._lock:
+            if self.current is None or self.current.version != version:
+                if self.current is not None:
+                    self.current.cancel()
+                self.current = Warmup(version, jobs(), self.workers, self.caches, self.share)
+            return self.current